@@ -0,0 +1,147 @@
+# Python 2 and 3:
+from __future__ import print_function
+import threading
+import time
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+# responses telling us the server is overloaded or throttling us
+throttleCodes=(429,502,503,504)
+
+
+class adaptiveLimiter :
+    """ Concurrency limit for one host, adjusted by additive increase / multiplicative decrease.
+ Every -- window -- seconds the aggregate throughput is compared with the previous window: while it
+ keeps improving and the callers used every slot they had (so one more could be used at all) the limit goes
+ up by one, when it drops clearly the limit is cut back. Callers should be able to use -- maximum -- slots,
+ the limiter is what holds them back. A throttling
+ response (429/503...), a connection error or a latency spike halves the limit straight away.
+ The limit stays between -- minimum -- and -- maximum --."""
+
+    def __init__(self,initial,maximum,minimum=1,window=5.) :
+        self.minimum=minimum
+        self.maximum=maximum
+        self.limit=float(max(minimum,min(initial,maximum)))
+        self.window=window
+        self.inflight=0
+        self.cond=threading.Condition()
+        self.windowStart=time.time()
+        self.windowBytes=0
+        self.saturated=False
+        self.lastRate=None
+        self.baseLatency=None
+        self.lastDecrease=0.
+
+    def acquire(self) :
+        with self.cond :
+            while self.inflight >= int(self.limit) :
+                self.saturated=True
+                self.cond.wait()
+            self.inflight+=1
+            if self.inflight >= int(self.limit) :
+                self.saturated=True
+
+    def release(self) :
+        with self.cond :
+            self.inflight-=1
+            self.cond.notify_all()
+
+    def progress(self,nbytes) :
+        """ count -- nbytes -- towards the throughput of the current window."""
+        with self.cond :
+            self.windowBytes+=nbytes
+            now=time.time()
+            if now - self.windowStart < self.window :
+                return
+            rate=self.windowBytes/(now - self.windowStart)
+            if self.lastRate is None or rate > 1.05*self.lastRate :
+                if self.saturated :
+                    self._setLimit(self.limit+1)    # still gaining with every slot busy, probe one more connection
+            elif rate < 0.7*self.lastRate :
+                self._decrease(0.75)                 # more connections made it slower
+            self.lastRate=rate
+            self.windowStart=now
+            self.windowBytes=0
+            self.saturated=self.inflight >= int(self.limit)
+
+    def latency(self,seconds) :
+        """ time from sending a request to its response headers; a spike well above the best seen backs off."""
+        with self.cond :
+            if self.baseLatency is None or seconds < self.baseLatency :
+                self.baseLatency=seconds
+            elif seconds > max(4*self.baseLatency,1.) :
+                self._decrease(0.5)
+
+    def failed(self) :
+        with self.cond :
+            self._decrease(0.5)
+
+    def _decrease(self,factor) :
+        # one cut per window, a burst of errors from the same overload should not collapse the limit to 1
+        now=time.time()
+        if now - self.lastDecrease < self.window :
+            return
+        self.lastDecrease=now
+        self.lastRate=None
+        self._setLimit(self.limit*factor)
+
+    def _setLimit(self,limit) :
+        self.limit=max(self.minimum,min(self.maximum,limit))
+        self.cond.notify_all()
+
+
+class hostLimits :
+    """ One adaptiveLimiter per host, created on first use. Use as
+        with limits(url) as slot :
+            r=session.get(url)
+            slot.check(r)
+            ... slot.progress(len(chunk))
+ which holds a connection slot for the host of -- url -- while the block runs."""
+
+    def __init__(self,initial,maximum,minimum=1,window=5.) :
+        self.settings=(initial,maximum,minimum,window)
+        self.limiters={}
+        self.lock=threading.Lock()
+
+    def limiter(self,url) :
+        host=urlparse(url).netloc
+        with self.lock :
+            if host not in self.limiters :
+                self.limiters[host]=adaptiveLimiter(*self.settings)
+            return self.limiters[host]
+
+    def __call__(self,url) :
+        return _slot(self.limiter(url))
+
+    def summary(self) :
+        with self.lock :
+            return {host:int(l.limit) for host,l in self.limiters.items()}
+
+
+class _slot :
+    def __init__(self,limiter) :
+        self.limiter=limiter
+
+    def __enter__(self) :
+        self.limiter.acquire()
+        self.start=time.time()
+        return self
+
+    def check(self,response) :
+        """ record the latency of -- response -- and whether the server is throttling us."""
+        self.limiter.latency(time.time() - self.start)
+        if response.status_code in throttleCodes :
+            self.limiter.failed()
+
+    def progress(self,nbytes) :
+        self.limiter.progress(nbytes)
+
+    def __exit__(self,excType,exc,tb) :
+        # an error carrying the response (HTTPError, a login page) is the server answering, check() has
+        # already judged it; only connection errors, resets and timeouts count as the host failing
+        if excType is not None and not issubclass(excType,(KeyboardInterrupt,SystemExit)) and getattr(exc,'response',None) is None :
+            self.limiter.failed()
+        self.limiter.release()
+        return False
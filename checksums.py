@@ -0,0 +1,125 @@
+# Python 2 and 3:
+from __future__ import print_function
+import os
+import hashlib
+import mmap
+import xml.etree.ElementTree as ET
+
+# algorithms we can compute, by the names they go by in granule metadata
+algorithmNames={'md5':'md5','sha1':'sha1','sha-1':'sha1','sha256':'sha256','sha-256':'sha256','sha512':'sha512','sha-512':'sha512'}
+
+
+def newHash(algorithm) :
+    """ a hashlib object for -- algorithm -- (md5, sha1, sha256, ...)."""
+    return hashlib.new(algorithmNames.get(algorithm.lower(),algorithm.lower()))
+
+
+def formatChecksum(algorithm,hexdigest) :
+    """ checksums are kept as 'algorithm:hexdigest' so a stored value says how to check it."""
+    return '{0}:{1}'.format(algorithmNames.get(algorithm.lower(),algorithm.lower()),hexdigest.lower())
+
+
+def splitChecksum(checksum) :
+    algorithm,hexdigest=checksum.split(':',1)
+    return algorithm,hexdigest
+
+
+def hashFile(path,algorithm,chunkSize=8*1024*1024,mapped=False) :
+    """ 'algorithm:hexdigest' of the file at -- path --, None if it can not be read.
+ With -- mapped -- the file is memory mapped and hashed in place rather than copied through read buffers,
+ which is what the verification of big trees uses."""
+    h=newHash(algorithm)
+    try :
+        with open(path,'rb') as f :
+            size=os.fstat(f.fileno()).st_size
+            if mapped and size > 0 :
+                m=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+                view=memoryview(m)
+                try :
+                    for offset in range(0,size,chunkSize) :
+                        h.update(view[offset:offset+chunkSize])
+                finally :
+                    view.release()
+                    m.close()
+            else :
+                for chunk in iter(lambda : f.read(chunkSize),b'') :
+                    h.update(chunk)
+    except (IOError,OSError,ValueError) :
+        return None
+    return formatChecksum(algorithm,h.hexdigest())
+
+
+def sidecarsFor(path) :
+    """ where the granule metadata of -- path -- may be: file.tif.xml or file.xml next to it."""
+    stem=os.path.splitext(path)[0]
+    return [path+'.xml',stem+'.xml'] if not path.endswith('.xml') else []
+
+
+def _local(tag) :
+    return tag.rsplit('}',1)[-1].lower()
+
+
+def publishedChecksums(xmlPath) :
+    """ {file name: 'algorithm:hexdigest'} for the checksums published in the granule metadata file
+ -- xmlPath --. Understands the UMM-G/ECHO style <Checksum><Value/><Algorithm/></Checksum> and the ECS style
+ <CheckSum><CheckSumValue/><CheckSumType/></CheckSum>; the file name comes from a Name, FileName or
+ DistributionFileName next to the checksum, or is None when the metadata does not say. Checksums in
+ algorithms hashlib does not have (e.g. CKSUM) are left out."""
+    found={}
+    try :
+        root=ET.parse(xmlPath).getroot()
+    except (ET.ParseError,IOError,OSError) :
+        return found
+    for parent in root.iter() :
+        for child in parent :
+            if _local(child.tag) not in ('checksum','checksuminfo') :
+                continue
+            fields={_local(c.tag):(c.text or '').strip() for c in child}
+            value=fields.get('value') or fields.get('checksumvalue')
+            algorithm=(fields.get('algorithm') or fields.get('checksumtype') or '').lower()
+            if not value or algorithm not in algorithmNames :
+                continue
+            siblings={_local(c.tag):(c.text or '').strip() for c in parent}
+            name=siblings.get('name') or siblings.get('filename') or siblings.get('distributionfilename')
+            found[os.path.basename(name) if name else None]=formatChecksum(algorithm,value)
+    return found
+
+
+def checkPublished(path,checksum,sidecar,mapped=False) :
+    """ compare a file against the checksum published for it in -- sidecar --.
+ -- checksum -- is what was computed while downloading it ('algorithm:hexdigest', or None).
+ Returns True or False, or None when the sidecar publishes nothing for the file. Only when the
+ sidecar uses another algorithm is the file read again."""
+    published=publishedChecksums(sidecar)
+    expected=published.get(os.path.basename(path))
+    if expected is None and len(published) == 1 :
+        expected=published.get(None)
+    if expected is None :
+        return None
+    return checkExpected(path,checksum,expected,mapped)
+
+
+def checkExpected(path,checksum,expected,mapped=False) :
+    """ whether the file at -- path -- has the checksum -- expected -- ('algorithm:hexdigest'), e.g. one an
+ order file gave for it. -- checksum -- is what was computed while downloading it, or None; the file is
+ only read again when that is missing or in another algorithm."""
+    algorithm,hexdigest=splitChecksum(expected)
+    if checksum is None or splitChecksum(checksum)[0] != algorithm :
+        checksum=hashFile(path,algorithm,mapped=mapped)
+    return checksum == formatChecksum(algorithm,hexdigest)
+
+
+def verifyOne(path,recorded) :
+    """ re-hash one local file for --verify. Returns (path, problem) with problem None when the file
+ matches the checksum published in its sidecar, or else the one -- recorded -- at download time."""
+    for sidecar in sidecarsFor(path) :
+        if os.path.isfile(sidecar) :
+            ok=checkPublished(path,None,sidecar,mapped=True)
+            if ok is not None :
+                return path,None if ok else 'does not match the checksum in {0}'.format(sidecar)
+    if not recorded :
+        return path,None
+    computed=hashFile(path,splitChecksum(recorded)[0],mapped=True)
+    if computed is None :
+        return path,'could not be read'
+    return path,None if computed == recorded else 'does not match the checksum recorded when it was downloaded'
@@ -0,0 +1,194 @@
+# Python 2 and 3:
+from __future__ import print_function
+import os
+import base64
+import getpass
+
+# This next block is a bunch of Python 2/3 compatability                                                                                                                       
+try:
+   # Python 3.x Libs             
+    import urllib.request                                                                                                                                    
+    from urllib.request import build_opener, install_opener, Request, urlopen
+    from urllib.request import HTTPHandler, HTTPSHandler, HTTPCookieProcessor
+    from urllib.error import HTTPError, URLError
+    from urllib.parse import urlparse  
+
+    from http.cookiejar import MozillaCookieJar
+    from io import StringIO
+
+except ImportError as e:
+   # Python 2.x Libs                                                                                                                                                           
+    from urllib2 import build_opener, install_opener, Request, urlopen, HTTPError
+    from urllib2 import URLError, HTTPSHandler,  HTTPHandler, HTTPCookieProcessor
+    from urlparse import urlparse
+
+    from cookielib import MozillaCookieJar
+    from StringIO import StringIO
+
+
+###                                                                                                                                                                            
+
+
+class cookie_maintenance:
+    ### cookie methods from script generated by the Alaska Satellite Facility's bulk download service ###
+    
+    def __init__(self, lazy=False):
+        # Local stash of cookies so we don't always have to ask                                                                                              
+        self.cookie_jar_path = os.path.join( os.path.expanduser('~'), ".gimp_download_cookiejar.txt")
+        self.cookie_jar = None
+        # For SSL
+        self.context = {}
+        # Make sure cookie_jar is good to go! Lazy: only load the jar an earlier run saved, see login()
+        if lazy:
+            self.load_cookie()
+        else:
+            self.get_cookie()
+        
+    # Load the saved cookie jar without asking URS. True if its login cookie has not expired yet
+    def load_cookie(self):
+       if not os.path.isfile(self.cookie_jar_path):
+          return False
+       cookie_jar = MozillaCookieJar()
+       try:
+          cookie_jar.load(self.cookie_jar_path)   # drops the cookies that have expired
+       except (IOError, OSError):
+          return False
+       self.cookie_jar = cookie_jar
+       return self.check_cookie_is_logged_in(self.cookie_jar)
+
+    # Validate the cookie against URS, or log in again, once a data request got sent to the login server
+    def login(self):
+       return self.get_cookie()
+    
+
+    # Get and validate a cookie
+    def get_cookie(self):
+       if os.path.isfile(self.cookie_jar_path):
+          self.cookie_jar = MozillaCookieJar()
+          self.cookie_jar.load(self.cookie_jar_path)
+    
+          # make sure cookie is still valid
+          if self.check_cookie():
+             print(" > Re-using previous cookie jar.")
+             return True
+          else:
+             print(" > Could not validate old cookie Jar")
+    
+       # We don't have a valid cookie, prompt user for creds
+       print ("No existing URS cookie found, please enter Earthdata username & password:")
+       print ("(Credentials will not be stored, saved or logged anywhere)")
+    
+       # Keep trying 'till user gets the right U:P
+       while self.check_cookie() is False:
+          self.get_new_cookie()
+    
+       return True
+    
+    # Validate cookie before we begin
+    def check_cookie(self):
+    
+       if self.cookie_jar is None:
+          print (" > Cookiejar is bunk: {0}".format(self.cookie_jar))
+          return False
+    
+       # File we know is valid, used to validate cookie
+       file_check = 'https://urs.earthdata.nasa.gov/profile'
+    
+       # Apply custom Redirect Handler
+       opener = build_opener(HTTPCookieProcessor(self.cookie_jar), HTTPHandler(), HTTPSHandler(**self.context))
+       install_opener(opener)
+    
+       # Attempt a HEAD request
+       request = Request(file_check)
+       request.get_method = lambda : 'HEAD'
+       try:
+          print (" > attempting to download {0}".format(file_check))
+          response = urlopen(request, timeout=30)
+          resp_code = response.getcode()
+          # Make sure we're logged in
+          if not self.check_cookie_is_logged_in(self.cookie_jar):
+             return False
+    
+          # Save cookiejar
+          self.cookie_jar.save(self.cookie_jar_path)
+    
+       except HTTPError:
+          # If we get this error, again, it likely means the user has not agreed to current EULA
+          print ("\nIMPORTANT: ")
+          print ("User appears to lack permissions to download data from the Earthdata Datapool.")
+          print ("\n\nNew users: you must first have an account at Earthdata https://urs.earthdata.nasa.gov")
+          exit(-1)
+    
+       # This return codes indicate the USER has not been approved to download the data
+       if resp_code in (300, 301, 302, 303):    
+          print ("Redirect ({0}) occured, invalid cookie value!".format(resp_code))
+          return False
+    
+       # These are successes!
+       if resp_code in (200, 307):
+          return True
+    
+       return False
+    
+    def get_new_cookie(self):
+       # Start by prompting user to input their credentials
+    
+       # Another Python2/3 workaround
+       try:
+          new_username = raw_input("Username: ")
+       except NameError:
+          new_username = input("Username: ")
+       new_password = getpass.getpass(prompt="Password (will not be displayed): ")
+    
+    
+       try:
+          #python2
+          user_pass = base64.b64encode (bytes(new_username+":"+new_password))
+       except TypeError:
+          #python3
+          user_pass = base64.b64encode (bytes(new_username+":"+new_password, "utf-8"))
+          user_pass = user_pass.decode("utf-8")
+    
+       # Authenticate against URS, grab all the cookies
+       self.cookie_jar = MozillaCookieJar()
+       opener = build_opener(HTTPCookieProcessor(self.cookie_jar), HTTPHandler(), HTTPSHandler(**self.context))
+       request = Request('https://daacdata.apps.nsidc.org/pub/DATASETS/', headers={"Authorization": "Basic {0}".format(user_pass)})
+    
+       # Watch out cookie rejection!
+       try:
+          response = opener.open(request)
+       except HTTPError as e:
+          if e.code == 401:
+             print (" > Username and Password combo was not successful. Please try again.")
+             return False
+          else:
+             # If an error happens here, the user most likely has not confirmed EULA.
+             print ("\nIMPORTANT: There was an error obtaining a download cookie!")
+             print ("Your user appears to lack permission to download data from the ASF Datapool.")
+             print ("\n\nNew users: you must first log into Vertex and accept the EULA. In addition, your Study Area must be set at Earthdata https://urs.earthdata.nasa.gov")
+             exit(-1)
+       except URLError as e:
+          print ("\nIMPORTANT: There was a problem communicating with URS, unable to obtain cookie. ")
+          print ("Try cookie generation later.")
+          exit(-1)
+    
+       # Did we get a cookie?
+       if self.check_cookie_is_logged_in(self.cookie_jar):
+          #COOKIE SUCCESS!
+          self.cookie_jar.save(self.cookie_jar_path)
+          return True
+    
+       # if we aren't successful generating the cookie, nothing will work. Stop here!
+       print ("WARNING: Could not generate new cookie! Cannot proceed. Please try Username and Password again.")
+       print ("Response was {0}.".format(response.getcode()))
+       print ("\n\nNew users: you must first log into Vertex and accept the EULA. In addition, your Study Area must be set at Earthdata https://urs.earthdata.nasa.gov")
+       exit(-1)
+    
+    # make sure we're logged into URS
+    def check_cookie_is_logged_in(self, cj):
+       for cookie in cj:
+          if cookie.name == 'urs_user_already_logged' and not cookie.is_expired():
+              # Only get this cookie if we logged in successfully!
+              return True
+       
+       return False
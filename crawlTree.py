@@ -0,0 +1,174 @@
+# Python 3 only (asyncio)
+from __future__ import print_function
+import asyncio
+import random
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:
+    aiohttp = None   # listing pages are then fetched with the blocking requests session in worker threads
+
+
+# listing answers worth asking again after a while, anything else but 200 and 304 fails the directory at once
+transientCodes=(408,429,500,502,503,504)
+
+
+class listingError(Exception):
+    """ A directory -- urldir -- that could not be listed, and why."""
+    def __init__(self,urldir,reason):
+        Exception.__init__(self,'could not list {0}: {1}'.format(urldir,reason))
+        self.urldir=urldir
+
+
+class _crawlFailed:
+    """ Carries an exception raised while crawling back to the thread reading the results."""
+    def __init__(self,error):
+        self.error=error
+
+_done=object()
+
+
+def crawlTree(root,parse,select,maxConcurrent=10,session=None,cache=None,retries=0,backoff=1.,maxWait=120.,onError=None) :
+    """ Walk the Apache index tree below -- root -- breadth first with at most -- maxConcurrent -- listing requests
+ in flight, and yield (urldir, depth, files, dirs, details) for each directory as soon as it has been listed.
+ -- parse -- (urldir, html) returns (files, dirs, details) for a listing page and -- select -- (urldir, depth, dirs)
+ returns the subdirectories worth descending into; dirs in the yielded tuple are the selected ones.
+ Listing pages are fetched with aiohttp when it is installed, otherwise with the requests -- session --
+ in a thread pool. Either way the cookies of -- session -- go along. With a listingCache as -- cache --
+ listings are revalidated with conditional requests and only parsed when they changed.
+ A listing answered with 408, 429 or 5xx, or lost to a connection error, is asked for again up to -- retries --
+ times, waiting a random time up to min(-- maxWait --, -- backoff --*2**n) seconds or as long as Retry-After
+ says. A directory that still can not be listed raises listingError, or with -- onError -- (urldir, error)
+ is handed to it and left out while the crawl goes on."""
+    #
+    # the crawl runs in its own event loop on a helper thread, so callers can start working on the
+    # first directories while the rest of the tree is still being listed
+    results=queue.Queue()
+    def run() :
+        try :
+            asyncio.run(_crawl(root,parse,select,maxConcurrent,session,cache,results.put,(retries,backoff,maxWait),onError))
+        except BaseException as e :   # includes SystemExit from parse, re-raised in the caller's thread
+            results.put(_crawlFailed(e))
+        finally :
+            results.put(_done)
+    t=threading.Thread(target=run)
+    t.daemon=True
+    t.start()
+    while True :
+        item=results.get()
+        if item is _done :
+            break
+        if isinstance(item,_crawlFailed) :
+            raise item.error
+        yield item
+
+
+async def _crawl(root,parse,select,maxConcurrent,session,cache,emit,retry,onError) :
+    todo=asyncio.Queue()   # FIFO, so directories are listed level by level
+    todo.put_nowait((root,0))
+    async with _fetcher(maxConcurrent,session) as fetch :
+        async def worker() :
+            while True :
+                urldir,depth=await todo.get()
+                try :
+                    try :
+                        files,dirs,details=await _list(urldir,parse,fetch,cache,retry)
+                    except listingError as e :
+                        if onError is None :
+                            raise
+                        onError(urldir,e)
+                        continue
+                    dirs=select(urldir,depth,dirs)
+                    emit((urldir,depth,files,dirs,details))
+                    for dirname in dirs :
+                        todo.put_nowait((urldir+dirname,depth+1))
+                finally :
+                    todo.task_done()
+        workers=[asyncio.ensure_future(worker()) for n in range(maxConcurrent)]
+        finished=asyncio.ensure_future(todo.join())
+        # workers only return by raising, so whichever comes first tells us how the crawl ended
+        await asyncio.wait(workers+[finished],return_when=asyncio.FIRST_COMPLETED)
+        finished.cancel()
+        for w in workers :
+            w.cancel()
+        # collect every worker's exception, so asyncio does not complain about the ones not raised
+        errors=[w.exception() for w in workers if w.done() and not w.cancelled()]
+        errors=[e for e in errors if e is not None]
+        if errors :
+            raise errors[0]
+
+
+async def _fetchListing(urldir,fetch,headers,retry) :
+    retries,backoff,maxWait=retry
+    for n in range(retries+1) :
+        wait=random.uniform(0,min(maxWait,backoff*2**n))
+        try :
+            status,responseHeaders,html=await fetch(urldir,headers)
+        except Exception as e :   # connection errors and timeouts, from aiohttp or requests
+            reason,transient=repr(e),True
+        else :
+            if status in (200,304) :
+                return status,responseHeaders,html
+            reason,transient='HTTP {0}'.format(status),status in transientCodes
+            retryAfter=responseHeaders.get('Retry-After','')
+            if retryAfter.isdigit() :
+                wait=max(wait,min(maxWait,int(retryAfter)))
+        if not transient or n == retries :
+            raise listingError(urldir,reason)
+        await asyncio.sleep(wait)
+
+
+async def _list(urldir,parse,fetch,cache,retry) :
+    if cache is None :
+        status,headers,html=await _fetchListing(urldir,fetch,{},retry)
+        return parse(urldir,html)
+    listing,conditional=cache.lookup(urldir)
+    if listing is not None :
+        return listing
+    status,headers,html=await _fetchListing(urldir,fetch,conditional,retry)
+    if status == 304 :
+        return cache.revalidated(urldir)
+    listing=parse(urldir,html)
+    if status == 200 :
+        cache.store(urldir,headers,listing)
+    return listing
+
+
+class _fetcher :
+    """ async context manager giving a coroutine function fetch(url, headers) that returns
+ (status, response headers, text) for a url."""
+    def __init__(self,maxConcurrent,session) :
+        self.maxConcurrent=maxConcurrent
+        self.session=session
+
+    async def __aenter__(self) :
+        if aiohttp is not None :
+            jar=aiohttp.CookieJar()
+            if self.session is not None :
+                for cookie in self.session.cookies :
+                    jar.update_cookies({cookie.name:cookie.value},
+                                       response_url=yarl.URL('https://'+cookie.domain.lstrip('.')+cookie.path))
+            self.client=aiohttp.ClientSession(cookie_jar=jar,connector=aiohttp.TCPConnector(limit=self.maxConcurrent))
+            async def fetch(url,headers) :
+                async with self.client.get(url,headers=headers) as resp :
+                    return resp.status,resp.headers,await resp.text()
+        else :
+            if self.session is None :
+                import requests
+                self.session=requests.Session()
+            self.pool=ThreadPoolExecutor(self.maxConcurrent)
+            async def fetch(url,headers) :
+                loop=asyncio.get_running_loop()
+                r=await loop.run_in_executor(self.pool,lambda : self.session.get(url,headers=headers))
+                return r.status_code,r.headers,r.text
+        return fetch
+
+    async def __aexit__(self,*exc) :
+        if aiohttp is not None :
+            await self.client.close()
+        else :
+            self.pool.shutdown(wait=False)
@@ -0,0 +1,104 @@
+# Python 2 and 3:
+from __future__ import print_function
+import re
+import calendar
+import datetime
+
+# month names as they appear in directory names (mmm), independent of the locale
+monthNames=('jan','feb','mar','apr','may','jun','jul','aug','sep','oct','nov','dec')
+
+
+def lastDay(year,month) :
+    """ the last day of -- month -- in -- year --, leap years included."""
+    return datetime.date(year,month,calendar.monthrange(year,month)[1])
+
+
+class datePattern :
+    """ The dateFormat of a product in productPaths.csv (yyyy-mm-dd, yyyy.mm.dd, mmm-dd-yyyy, yyyy-mm, yyyy ...)
+ compiled once into a regular expression, for turning directory names into the date intervals they cover:
+ the first date in a name is where the interval starts, a second one where it ends. A name with one date
+ covers the rest of its month, or of its year when the format has no month; so does a second date without
+ a day. Names without a date get None.
+        pattern=datePattern('yyyy-mm-dd')
+        pattern.select(dirs,datetime.date(2015,1,1),datetime.date(2015,6,30))"""
+
+    fields={'yyyy':r'\d{4}','yy':r'\d{2}','mmm':r'[A-Za-z]{3}','mm':r'\d{2}','dd':r'\d{2}'}
+
+    def __init__(self,dateFormat) :
+        self.dateFormat=dateFormat.strip()
+        self.tokens=re.findall(r'[A-Za-z]+',self.dateFormat)
+        unknown=[token for token in self.tokens if token not in self.fields]
+        if not self.tokens or unknown :
+            raise ValueError('can not read dates formatted as {0}'.format(self.dateFormat))
+        separators=re.findall(r'[^A-Za-z]+',self.dateFormat.strip('.-_ '))
+        regex='('+self.fields[self.tokens[0]]+')'
+        for separator,token in zip(separators,self.tokens[1:]) :
+            regex+=re.escape(separator)+'('+self.fields[token]+')'
+        # a date is not part of a longer run of digits
+        self.regex=re.compile(r'(?<![0-9])'+regex+r'(?![0-9])')
+        self.hasMonth=any(token in ('mm','mmm') for token in self.tokens)
+        self.hasDay='dd' in self.tokens
+
+    def _date(self,groups) :
+        year,month,day=None,1,1
+        for token,value in zip(self.tokens,groups) :
+            if token == 'yyyy' :
+                year=int(value)
+            elif token == 'yy' :
+                year=int(value)+(1900 if int(value) >= 69 else 2000)   # as time.strptime('%y') does
+            elif token == 'mm' :
+                month=int(value)
+            elif token == 'mmm' :
+                month=monthNames.index(value.lower())+1
+            else :
+                day=int(value)
+        return datetime.date(year,month,day)
+
+    def _end(self,date) :
+        # the last day a date of this format stands for
+        return lastDay(date.year,date.month) if self.hasMonth else datetime.date(date.year,12,31)
+
+    def interval(self,name) :
+        """ (start, end) dates covered by the directory -- name --, None when it holds no valid date."""
+        try :
+            dates=[self._date(m.groups()) for m in self.regex.finditer(name)][:2]
+        except ValueError :   # an unknown month name or a day the month does not have
+            return None
+        if not dates :
+            return None
+        if len(dates) > 1 and self.hasDay :
+            return dates[0],dates[1]
+        return dates[0],self._end(dates[-1])
+
+    def intervals(self,names) :
+        """ interval() of every name in the listing -- names --, in the same order."""
+        return [self.interval(name) for name in names]
+
+    def queryRange(self,firstdate,lastdate) :
+        """ -- firstdate -- and -- lastdate -- widened to whole months, or whole years, when the directory
+ names of this format do not resolve days, or months."""
+        if not self.hasDay :
+            firstdate=datetime.date(firstdate.year,firstdate.month if self.hasMonth else 1,1)
+            lastdate=self._end(lastdate)
+        return firstdate,lastdate
+
+    @staticmethod
+    def overlaps(interval,firstdate,lastdate) :
+        """ whether -- interval -- shares at least one day with firstdate..lastdate."""
+        return interval is not None and interval[1] >= firstdate and interval[0] <= lastdate
+
+    @staticmethod
+    def contains(interval,date) :
+        """ whether -- date -- falls inside -- interval --."""
+        return interval is not None and interval[0] <= date <= interval[1]
+
+    def newest(self,names,count) :
+        """ the names in -- names -- with the -- count -- latest start dates (all the names sharing one of them),
+ in their order; names without a date are left out."""
+        starts=[interval[0] if interval is not None else None for interval in self.intervals(names)]
+        latest=set(sorted(set(start for start in starts if start is not None),reverse=True)[:count])
+        return [name for name,start in zip(names,starts) if start in latest]
+
+    def select(self,names,firstdate,lastdate) :
+        """ the names in -- names -- whose intervals overlap firstdate..lastdate."""
+        return [name for name,interval in zip(names,self.intervals(names)) if self.overlaps(interval,firstdate,lastdate)]
@@ -0,0 +1,128 @@
+# Python 2 and 3:
+from __future__ import print_function
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class downloadState :
+    """ What has been downloaded and verified, kept in an SQLite database at -- path -- (WAL mode, so the
+ pipeline can write while other threads read). One row per granule url with the local path (relative to the
+ directory the database is in, so the tree reads the same from any working directory), size, ETag,
+ checksum, the size and date the directory listing showed when it was fetched, download time and status.
+ A re-sync asks verified() for each listed directory and only has to look at the files that are not in it."""
+
+    schema='''CREATE TABLE IF NOT EXISTS granules (
+                  url TEXT PRIMARY KEY,
+                  dir TEXT,
+                  path TEXT,
+                  size INTEGER,
+                  etag TEXT,
+                  last_modified TEXT,
+                  checksum TEXT,
+                  listed TEXT,
+                  downloaded_at REAL,
+                  elapsed REAL,
+                  status TEXT);
+              CREATE INDEX IF NOT EXISTS granules_dir ON granules (dir);'''
+
+    def __init__(self,path) :
+        self.path=path
+        self.root=os.path.dirname(path)
+        self.local=threading.local()
+        db=self._db()
+        db.execute('PRAGMA journal_mode=WAL')
+        db.executescript(self.schema)
+
+    def _db(self) :
+        # sqlite connections can not be shared between threads, each thread gets its own
+        if getattr(self.local,'db',None) is None :
+            self.local.db=sqlite3.connect(self.path,timeout=60)
+            self.local.db.execute('PRAGMA synchronous=NORMAL')
+        return self.local.db
+
+    def _relative(self,path) :
+        return os.path.relpath(path,self.root or os.curdir)
+
+    def _resolve(self,path) :
+        # an absolute path stays as it is
+        return os.path.normpath(os.path.join(self.root,path))
+
+    @staticmethod
+    def _listed(listed) :
+        return json.dumps(listed or {},sort_keys=True)
+
+    def verified(self,urldir,details) :
+        """ names of the files in -- details -- (listing details of -- urldir --) that were verified before
+ while the listing showed the same size and date, and are still on disk with that size."""
+        rows=self._db().execute("SELECT url,path,size,listed FROM granules WHERE dir=? AND status='ok'",(urldir,))
+        known={url:(path,size,listed) for url,path,size,listed in rows}
+        done=set()
+        for name,listed in details.items() :
+            row=known.get(urldir+name)
+            if row is None or row[2] != self._listed(listed) :
+                continue
+            try :
+                if os.path.getsize(self._resolve(row[0])) == row[1] :
+                    done.add(name)
+            except OSError :
+                pass
+        return done
+
+    def record(self,url,urldir,path,remote,listed,status,elapsed=None,checksum=None) :
+        """ store the outcome of one file: -- status -- is 'ok' or 'failed', -- remote -- its manifest entry."""
+        db=self._db()
+        with db :
+            db.execute('INSERT OR REPLACE INTO granules VALUES (?,?,?,?,?,?,?,?,?,?,?)',
+                       (url,urldir,self._relative(path),remote.get('size'),remote.get('etag'),remote.get('last_modified'),
+                        checksum,self._listed(listed),time.time(),elapsed,status))
+
+    def checksums(self) :
+        """ {local path: checksum} of every granule with a checksum recorded."""
+        rows=self._db().execute('SELECT path,checksum FROM granules WHERE checksum IS NOT NULL')
+        return {self._resolve(path):checksum for path,checksum in rows}
+
+    def throughput(self,recent=200,gap=60.) :
+        """ bytes per second the last -- recent -- downloads came in at all together: their bytes over the time
+ downloads were running. That is the union of their start to finish intervals, with pauses of up to -- gap --
+ seconds between them (listing the next directory) counted in, and longer ones (between runs) left out.
+ None before any download."""
+        rows=self._db().execute("SELECT size,downloaded_at,elapsed FROM granules WHERE status='ok' AND elapsed IS NOT NULL "
+                                'AND size IS NOT NULL ORDER BY downloaded_at DESC LIMIT ?',(recent,)).fetchall()
+        if not rows :
+            return None
+        active=0.
+        start=end=None
+        for first,last in sorted((at-elapsed,at) for size,at,elapsed in rows) :
+            if end is not None and first <= end+gap :
+                end=max(end,last)
+                continue
+            if end is not None :
+                active+=end-start
+            start,end=first,last
+        active+=end-start
+        return sum(size for size,at,elapsed in rows)/active if active > 0 else None
+
+    def done(self) :
+        """ {url: (local path, size)} of every granule downloaded and verified."""
+        rows=self._db().execute("SELECT url,path,size FROM granules WHERE status='ok'")
+        return {url:(self._resolve(path),size) for url,path,size in rows}
+
+    def merge(self,path) :
+        """ copy the rows of the state database at -- path -- (another shard's) into this one, where they are
+ newer than what this one has for the same url."""
+        db=self._db()
+        db.execute('ATTACH DATABASE ? AS other',(path,))
+        try :
+            with db :
+                db.execute('INSERT OR REPLACE INTO granules SELECT * FROM other.granules AS o WHERE NOT EXISTS '
+                           '(SELECT 1 FROM granules AS g WHERE g.url=o.url AND g.downloaded_at >= o.downloaded_at)')
+        finally :
+            db.execute('DETACH DATABASE other')
+
+    def lastDownload(self) :
+        """ (url, time) of the granule downloaded most recently, None before any was."""
+        return self._db().execute("SELECT url,downloaded_at FROM granules WHERE status='ok' AND elapsed IS NOT NULL "
+                                  'ORDER BY downloaded_at DESC LIMIT 1').fetchone()
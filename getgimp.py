@@ -7,233 +7,230 @@
 #        to get list of command line arguments 
 #
 
-# Python 2 and 3:
+# Python 3 only
 from __future__ import print_function   
 
 import csv
+import copy
+import json
 import os, os.path, sys
 
 import re
-from bs4 import BeautifulSoup
 import argparse
 import threading
+import queue
 
-import base64
-import datetime, time, calendar
-import getpass
+import datetime, time
+import random
+from urllib.parse import urlparse
 
-import requests
-from runMyThreads import runMyThreads
+# requests, the crawler (asyncio/aiohttp), the Earthdata login (urllib/http.cookiejar) and the process pool
+# are imported where they are first needed, so -h, -pd and listings from the cache start quickly.
+# python importBudget.py keeps an eye on that.
+from adaptiveConcurrency import hostLimits
+from listingCache import listingCache
+from downloadState import downloadState
+from indexParser import parseIndex
+from dateFilter import datePattern
+from shards import parseShard, shardOf, inShard, shardSuffix
+from jobFile import readJobs
+from regionCatalog import regionCatalog
+from orderFile import readOrder
+from checksums import newHash, formatChecksum, hashFile, sidecarsFor, checkPublished, checkExpected, verifyOne
 
-# This next block is a bunch of Python 2/3 compatability                                                                                                                       
-try:
-   # Python 3.x Libs             
-    import urllib.request                                                                                                                                    
-    from urllib.request import build_opener, install_opener, Request, urlopen
-    from urllib.request import HTTPHandler, HTTPSHandler, HTTPCookieProcessor
-    from urllib.error import HTTPError, URLError
-    from urllib.parse import urlparse  
+# bytes read from the socket and written to disk at a time when streaming a download
+DEFAULT_CHUNK_SIZE = 1024*1024
+# files at least this large are downloaded as several byte ranges at once
+DEFAULT_SEGMENT_THRESHOLD = 512*1024*1024
+DEFAULT_SEGMENTS = 4
+# files downloaded at once to start with, see max_connections
+DEFAULT_THREADS = 10
+# files of an --input order handed to the pipeline at a time, as they are read
+ORDER_BATCH = 200
+# attempts per file after the first one, and the longest wait between two of them in seconds
+DEFAULT_RETRIES = 5
+RETRY_MAX_WAIT = 120
 
-    from http.cookiejar import MozillaCookieJar
-    from io import StringIO
+# one requests.Session shared by every thread, so keep-alive connections are reused across listing
+# pages and files and the URS cookies go along with every request. Set up by make_session in __main__.
+session = None
 
-except ImportError as e:
-   # Python 2.x Libs                                                                                                                                                           
-    from urllib2 import build_opener, install_opener, Request, urlopen, HTTPError
-    from urllib2 import URLError, HTTPSHandler,  HTTPHandler, HTTPCookieProcessor
+def make_session(cookie_jar=None,pool_size=DEFAULT_THREADS):
+    import requests
+    s = requests.Session()
+    # urllib3 pools are thread safe; size them so no worker has to open a throwaway connection
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,pool_maxsize=pool_size)
+    s.mount('https://',adapter)
+    s.mount('http://',adapter)
+    if cookie_jar is not None:
+        s.cookies = cookie_jar   # any cookielib jar works, and it locks itself
+    return s
 
-    from cookielib import MozillaCookieJar
-    from StringIO import StringIO
+# the Earthdata login, see cookie_maintenance. __main__ only loads the cookie jar saved by an earlier run;
+# whether it is still good is checked against URS, and the user asked to log in if need be, only once a
+# data request gets sent to the login server instead of the data (check_login). Listing runs never log in.
+auth = None
+URS_HOST = 'urs.earthdata.nasa.gov'
+login_lock = threading.Lock()
+login_state = {'count':0,'failed':False}
 
+# the server answered with the Earthdata login (or 401) instead of the data, response is that answer
+class login_required(Exception):
+    def __init__(self,message,response=None):
+        Exception.__init__(self,message)
+        self.response = response
 
-###                                                                                                                                                                            
+# raise login_required if the server answered r with a login instead of the data
+def check_login(r):
+    if r.status_code == 401 or urlparse(r.url).netloc == URS_HOST:
+        r.close()
+        raise login_required('{0} needs an Earthdata login'.format(r.url),r)
 
+# log in after a data request running since login_state['count'] was seen hit the login server. The first
+# thread to get here logs in, the ones waiting behind it find the count moved on and just retry. False if
+# the login failed, then the remaining files fail without asking again.
+def login(seen):
+    with login_lock:
+        if login_state['count'] == seen and not login_state['failed']:
+            try:
+                auth.login()
+                get_session().cookies = auth.cookie_jar
+            except SystemExit:   # cookie_maintenance gives up with exit(), only end this run's downloads
+                login_state['failed'] = True
+            login_state['count'] += 1
+        return not login_state['failed']
 
-class cookie_maintenance:
-    ### cookie methods from script generated by the Alaska Satellite Facility's bulk download service ###
-    
-    def __init__(self):
-        # Local stash of cookies so we don't always have to ask                                                                                              
-        self.cookie_jar_path = os.path.join( os.path.expanduser('~'), ".gimp_download_cookiejar.txt")
-        self.cookie_jar = None
-        # For SSL
-        self.context = {}
-        # Make sure cookie_jar is good to go!                                                                                                                
-        self.get_cookie()
-        
-    # Get and validate a cookie
-    def get_cookie(self):
-       if os.path.isfile(self.cookie_jar_path):
-          self.cookie_jar = MozillaCookieJar()
-          self.cookie_jar.load(self.cookie_jar_path)
-    
-          # make sure cookie is still valid
-          if self.check_cookie():
-             print(" > Re-using previous cookie jar.")
-             return True
-          else:
-             print(" > Could not validate old cookie Jar")
-    
-       # We don't have a valid cookie, prompt user for creds
-       print ("No existing URS cookie found, please enter Earthdata username & password:")
-       print ("(Credentials will not be stored, saved or logged anywhere)")
-    
-       # Keep trying 'till user gets the right U:P
-       while self.check_cookie() is False:
-          self.get_new_cookie()
-    
-       return True
-    
-    # Validate cookie before we begin
-    def check_cookie(self):
-    
-       if self.cookie_jar is None:
-          print (" > Cookiejar is bunk: {0}".format(self.cookie_jar))
-          return False
-    
-       # File we know is valid, used to validate cookie
-       file_check = 'https://urs.earthdata.nasa.gov/profile'
-    
-       # Apply custom Redirect Handler
-       opener = build_opener(HTTPCookieProcessor(self.cookie_jar), HTTPHandler(), HTTPSHandler(**self.context))
-       install_opener(opener)
-    
-       # Attempt a HEAD request
-       request = Request(file_check)
-       request.get_method = lambda : 'HEAD'
-       try:
-          print (" > attempting to download {0}".format(file_check))
-          response = urlopen(request, timeout=30)
-          resp_code = response.getcode()
-          # Make sure we're logged in
-          if not self.check_cookie_is_logged_in(self.cookie_jar):
-             return False
-    
-          # Save cookiejar
-          self.cookie_jar.save(self.cookie_jar_path)
-    
-       except HTTPError:
-          # If we get this error, again, it likely means the user has not agreed to current EULA
-          print ("\nIMPORTANT: ")
-          print ("User appears to lack permissions to download data from the Earthdata Datapool.")
-          print ("\n\nNew users: you must first have an account at Earthdata https://urs.earthdata.nasa.gov")
-          exit(-1)
-    
-       # This return codes indicate the USER has not been approved to download the data
-       if resp_code in (300, 301, 302, 303):    
-          print ("Redirect ({0}) occured, invalid cookie value!".format(resp_code))
-          return False
-    
-       # These are successes!
-       if resp_code in (200, 307):
-          return True
-    
-       return False
-    
-    def get_new_cookie(self):
-       # Start by prompting user to input their credentials
-    
-       # Another Python2/3 workaround
-       try:
-          new_username = raw_input("Username: ")
-       except NameError:
-          new_username = input("Username: ")
-       new_password = getpass.getpass(prompt="Password (will not be displayed): ")
-    
-    
-       try:
-          #python2
-          user_pass = base64.b64encode (bytes(new_username+":"+new_password))
-       except TypeError:
-          #python3
-          user_pass = base64.b64encode (bytes(new_username+":"+new_password, "utf-8"))
-          user_pass = user_pass.decode("utf-8")
-    
-       # Authenticate against URS, grab all the cookies
-       self.cookie_jar = MozillaCookieJar()
-       opener = build_opener(HTTPCookieProcessor(self.cookie_jar), HTTPHandler(), HTTPSHandler(**self.context))
-       request = Request('https://daacdata.apps.nsidc.org/pub/DATASETS/', headers={"Authorization": "Basic {0}".format(user_pass)})
-    
-       # Watch out cookie rejection!
-       try:
-          response = opener.open(request)
-       except HTTPError as e:
-          if e.code == 401:
-             print (" > Username and Password combo was not successful. Please try again.")
-             return False
-          else:
-             # If an error happens here, the user most likely has not confirmed EULA.
-             print ("\nIMPORTANT: There was an error obtaining a download cookie!")
-             print ("Your user appears to lack permission to download data from the ASF Datapool.")
-             print ("\n\nNew users: you must first log into Vertex and accept the EULA. In addition, your Study Area must be set at Earthdata https://urs.earthdata.nasa.gov")
-             exit(-1)
-       except URLError as e:
-          print ("\nIMPORTANT: There was a problem communicating with URS, unable to obtain cookie. ")
-          print ("Try cookie generation later.")
-          exit(-1)
-    
-       # Did we get a cookie?
-       if self.check_cookie_is_logged_in(self.cookie_jar):
-          #COOKIE SUCCESS!
-          self.cookie_jar.save(self.cookie_jar_path)
-          return True
-    
-       # if we aren't successful generating the cookie, nothing will work. Stop here!
-       print ("WARNING: Could not generate new cookie! Cannot proceed. Please try Username and Password again.")
-       print ("Response was {0}.".format(response.getcode()))
-       print ("\n\nNew users: you must first log into Vertex and accept the EULA. In addition, your Study Area must be set at Earthdata https://urs.earthdata.nasa.gov")
-       exit(-1)
-    
-    # make sure we're logged into URS
-    def check_cookie_is_logged_in(self, cj):
-       for cookie in cj:
-          if cookie.name == 'urs_user_already_logged':
-              # Only get this cookie if we logged in successfully!
-              return True
-       
-       return False
+# connection slots per host, grown while throughput improves and cut back on throttling or errors
+host_limits = hostLimits(DEFAULT_THREADS,DEFAULT_THREADS*DEFAULT_SEGMENTS)
 
-def get_names(urldir,args):
-    alist=[]
-    try:
-        r = requests.get(urldir)
-    except requests.exceptions.RequestException as e:
-        print(e)
-        exit(-1)
-    if r.status_code:
-        soup =  BeautifulSoup(r.text, 'html.parser')
-        for table in soup.find_all('table',{'id':'indexlist'}):
-            for tr in table.find_all('tr',{'class':['even','odd']}):     
-                for td in tr.find_all('td',{'class':'indexcolicon'}): # gets file names
-                    if 'parent' not in td.img['alt'].lower():
-                        for a in td.find_all('a'):
-#                            if '/pub/DATASETS/' not in a['href']: # and '/MEASURES/' not in a['href']:
-                            alist.append(a['href'])
-                            
-        flist = [item for item in alist if not item.endswith('/')]
-        dlist = [item for item in alist if item.endswith('/')]
-        
-        if args.type in dlist:
-                dlist = [item for item in alist if item == args.type]
-                
-        if args.region and args.region != 'all' and not urldir.endswith(args.region):
-            dlist = [item for item in alist if item == args.region.strip('/') + '/']  # to make dirs a list with one element
-            if not dlist and args.region not in urldir:
-                print()
-                print('Region {0} is not available for product {1}.'.format(args.region,args.prod))
-                print()
-                print('Possible regions include:')
-                time.sleep(2) # in case list is longer then terminal window is tall.
-                for item in alist:
-                    if item.endswith('/'):
-                        print(item)
+def get_session():
+    global session
+    if session is None:
+        session = make_session()
+    return session
+
+# listings already fetched during this run, so a directory is only requested once
+listing_memo = {}
+# listings kept between runs, see listingCache. Set up in __main__ unless --nocache.
+listing_cache = None
+LISTING_CACHE_PATH = os.path.join(os.path.expanduser('~'),'.gimp_download_cache','listings')
+# where the region directories of each product are, see regionCatalog
+REGION_CATALOG_PATH = os.path.join(os.path.expanduser('~'),'.gimp_download_cache','regions')
+
+# parse an Apache index page: file names, directory names and, for each file, the size and
+# last-modified columns as the server prints them. See indexParser for the row scanner.
+def parse_index(html):
+    return parseIndex(html)
+
+# narrow the subdirectories of urldir down to the requested --type and --region
+def filter_dirs(urldir,dlist,args):
+    if args.type in dlist:
+            dlist = [item for item in dlist if item == args.type]
+            
+    if args.region and args.region != 'all' and not urldir.endswith(args.region):
+        alist = dlist
+        dlist = [item for item in alist if item == args.region.strip('/') + '/']  # to make dirs a list with one element
+        if not dlist and args.region not in urldir:
+            print()
+            print('Possible regions for product {0} include:'.format(args.prod))
+            for item in alist:
+                print(item)
+            # the crawl may be on another thread, the caller stops the run with this
+            raise ValueError('Region {0} is not available for product {1}.'.format(args.region,args.prod))
+    return dlist
+
+# list one directory: (file names, directory names, file details), from the listing cache when it is
+# still valid there
+def get_listing(urldir,args):
+    import requests
+    if urldir not in listing_memo:
+        listing, headers = listing_cache.lookup(urldir) if listing_cache else (None, {})
+        if listing is None:
+            try:
+                r = get_session().get(urldir,headers=headers)
+            except requests.exceptions.RequestException as e:
+                print(e)
                 exit(-1)
-                
-        return flist, dlist
-    else:
-        print('requests.get response has bad status_code')
-        exit(-1)
-        
+            if r.status_code not in (200,304):
+                print('{0} could not be listed, HTTP {1}'.format(urldir,r.status_code))
+                exit(-1)
+            if r.status_code == 304:
+                listing = listing_cache.revalidated(urldir)
+            else:
+                listing = parse_index(r.text)
+                if listing_cache and r.status_code == 200:
+                    listing_cache.store(urldir,r.headers,listing)
+        listing_memo[urldir] = listing
+    flist, dlist, details = listing_memo[urldir]
+    return flist, filter_dirs(urldir,dlist,args), details
+
+def get_names(urldir,args):
+    flist, dlist, details = get_listing(urldir,args)
+    return flist, dlist
+
+# size, ETag and Last-Modified of every remote file seen, kept in <outpath>/.remote_manifest.json.
+# an entry is trusted for as long as the directory listing shows the same size and date for the file,
+# so only new or changed files cost a HEAD request; sizes the listing prints in exact bytes need none,
+# unless the file is big enough to be downloaded in segments and the server must say it accepts ranges.
+class remote_manifest:
+
+    def __init__(self,path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (IOError, ValueError):
+            self.entries = {}
+
+    def entry(self,url,listed=None):
+        listed = listed or {}
+        with self.lock:
+            known = self.entries.get(url)
+        if known and listed and known.get('listed') == listed:
+            return known
+        if re.match(r'^\d+$',listed.get('size','')):
+            # accept_ranges is left out, it is asked for only if the file is big enough to be segmented
+            known = {'size':int(listed['size']),'etag':None,'last_modified':listed.get('last_modified')}
+        else:
+            known = self.head(url)
+        known['listed'] = listed
+        with self.lock:
+            self.entries[url] = known
+        return known
+
+    # the entry for url completed with what a HEAD request says: whether the server accepts ranges, the
+    # ETag and Last-Modified. For files whose size came from the listing, before a segmented download.
+    def ranges(self,url):
+        known = dict(self.get(url))
+        head = self.head(url)
+        known.update({key:value for key,value in head.items() if value is not None})
+        with self.lock:
+            self.entries[url] = known
+        return known
+
+    def head(self,url):
+        with host_limits(url) as slot:
+            r = get_session().head(url,allow_redirects=True,headers={'Accept-Encoding':'identity'})
+            slot.check(r)
+        check_login(r)
+        r.raise_for_status()
+        return {'size':int(r.headers['Content-Length']) if 'Content-Length' in r.headers else None,
+                'etag':r.headers.get('ETag'),
+                'last_modified':r.headers.get('Last-Modified'),
+                'accept_ranges':r.headers.get('Accept-Ranges','').lower() == 'bytes'}
+
+    # the entry already known for url, without asking the server
+    def get(self,url):
+        with self.lock:
+            return self.entries.get(url,{})
+
+    def save(self):
+        with self.lock:
+            with open(self.path + '.tmp','w') as f:
+                json.dump(self.entries,f)
+            os.replace(self.path + '.tmp',self.path)
+
 # if user only put in tenths of a degree, region directory name includes the hundreths place, so insert the zero
 def check_region_name(region):
     try:
@@ -247,75 +244,57 @@ def check_region_name(region):
     except:
         return ''
 
-# find dates in directory names 
+# the directories whose names date them within --firstdate..--lastdate, only the newest of them
+# while --watch is polling for new granules
 def directory_dates(dirs,args):
-    dt_f = {'mmm':'%b','mm':'%m','yyyy':'%Y','yy':'%y','dd':'%d'}
-    days_in_month = {1:31,2:28,3:31,4:30,5:31,6:30,7:31,8:31,9:30,10:31,11:30,12:31}
-    t0=[]
-    t1=[]
-    
-    dirdate_format = prod_path[args.prod][args.dival['dateFormat']]  # in dir names
-    dd_f = re.findall(r"[\w']+",dirdate_format)
+    dirs = args.date_pattern.select(dirs,*args.dates)
+    if args.watch_newest:
+        dirs = args.date_pattern.newest(dirs,args.watch_newest)
+    return dirs
 
-    try:
-        sep  = re.findall(r"[.-]+",dirdate_format)[0]
-    except:
-        sep = ''
-    dt_format = '-'.join([dt_f[dd_f[item]] for item in range(len(dd_f))]) # python-ese
+# which subdirectories of a directory -- depth -- levels below the product url are worth listing,
+# following the layout given by dateLevel in productPaths.csv
+def select_subdirs(args,depth,dirs):
+    level = prod_path[args.prod][args.dival['dateLevel']]
+    # dateLevel = 0: no date level, but may have types
+    if level == 0:
+        return dirs if depth == 0 else []
+    # dateLevel = 1: date directories, possibly holding one directory per type
+    if level == 1:
+        if depth == 0:
+            dirs = directory_dates(dirs,args)
+            if args.byname and args.byname not in dirs:
+                dirs.append(args.byname)
+            return dirs
+        if depth == 1 and (not args.type or args.type in dirs):
+            return dirs
+        return []
+    # dateLevel = 2: region directories holding date directories, picked by --bbox/--point if given
+    if depth == 0:
+        args.regions.addNames(dirs)
+        if args.region and args.area:
+            return args.regions.select(dirs,args.area)
+        return dirs if args.region else []
+    if depth == 1 and dirs:
+        dirs = directory_dates(dirs,args)
+        if args.byname:
+            dirs.append(args.byname)
+        return dirs
+    return []
 
-    for dirname in dirs:
-        # build format to convert from, in python-ese
-        if len(dd_f)==3:
-            
-            #forma = sep.join[len(dd_f[i]) for i in len(dd_f)]
-            pattern = re.compile(r'(\w{%d}%s\w{%d}%s\w{%d})' % (len(dd_f[0]),sep,len(dd_f[1]),sep,len(dd_f[2]))) # doesn't like list comp
-            m = re.findall(pattern,dirname)
-            if m:
-                dt = time.strptime(m[0].replace(sep,'-'),dt_format)
-                t0.append(datetime.date(dt.tm_year,dt.tm_mon,dt.tm_mday)) 
-                if len(m)>1:
-                    dt = time.strptime(m[1],dt_format)
-                    t1.append(datetime.date(dt.tm_year,dt.tm_mon,dt.tm_mday))
-                else:
-                    t1.append(datetime.date(dt.tm_year,dt.tm_mon,days_in_month[dt.tm_mon]))
-            else:
-                t0.append(datetime.date(2100,1,1)) # will not get dirs if no dates in them, use --byname
-                t1.append(datetime.date(1900,1,1))
-
-        # sometimes there are only year and month
-        elif len(dd_f)==2:
-            pattern = re.compile(r'(\w{%d}%s\w{%d})' % (len(dd_f[0]),sep,len(dd_f[1]))) 
-            m = re.findall(pattern,dirname) 
-            if m:
-                dt = time.strptime(m[0],dt_format)
-                t0.append(datetime.date(dt.tm_year,dt.tm_mon,dt.tm_mday)) # default is first day
-                if len(m)>1:
-                    dt = time.strptime(m[1],dt_format)
-                    t1.append(datetime.date(dt.tm_year,dt.tm_mon,dt.tm_mday))
-                else:          
-                    t1.append(datetime.date(dt.tm_year,dt.tm_mon,days_in_month[dt.tm_mon])) # set to last day
-            else:
-                t0.append(datetime.date(2100,1,1)) # will not get dirs if no dates in them, use --byname
-                t1.append(datetime.date(1900,1,1))
-            
-        # sometimes there is only year
-        elif len(dirdate_format.split('-'))==1:
-            pattern = re.compile(r'(\d{%d})' % len(dd_f[0]))
-            m = re.findall(pattern,dirname) 
-            if m:
-                dt = time.strptime(m[0],dt_format)
-                t0.append(datetime.date(dt.tm_year,dt.tm_mon,dt.tm_mday)) # default is first month, first day
-                if len(m)>1:
-                    dt = time.strptime(m[1],dt_format)
-                else:
-                    dt = time.strptime(m[0],dt_format)
-                t1.append(datetime.date(dt.tm_year,12,31))                # set to last month, last day
-            else:
-                t0.append(datetime.date(2100,1,1)) # will not get dirs if no dates in them, use --byname
-                t1.append(datetime.date(1900,1,1))
-                
-    mask = [t1[ii]>=firstdate and t0[ii]<=lastdate for ii in range(len(t0))]
-    return [dirs[ii] for ii in range(len(dirs)) if mask[ii]]    
+# list the directory tree of a product concurrently, yielding (urldir, depth, files, dirs, details)
+# for every directory as soon as it has been listed. Listings the server refuses for a while (429, 503...)
+# are retried as files are, with args.retries and args.backoff; directories that still can not be listed
+# are reported, added to the failed list and left out, so the rest of the tree goes on.
+def crawl_product(url,args,failed):
+    from crawlTree import crawlTree
+    def unlisted(urldir,error):
+        print('\n {0}'.format(error))
+        failed.append(urldir)
+    return crawlTree(url,lambda urldir,html: parse_index(html),
+                     lambda urldir,depth,dirs: select_subdirs(args,depth,filter_dirs(urldir,dirs,args)),
+                     maxConcurrent=args.threads,session=get_session(),cache=listing_cache,
+                     retries=args.retries,backoff=args.backoff,maxWait=RETRY_MAX_WAIT,onError=unlisted)
 
 def establish_dir(download_dir):
    if not os.path.exists(download_dir):
@@ -324,48 +303,254 @@ def establish_dir(download_dir):
             print ("WARNING: Cannot write to this path! Check permissions for {0}".format(download_dir))
             exit(-1)
     
-def download_files(url,args,dirpath,file_list):
+# a .part file remembers which version of the remote file it holds (ETag or Last-Modified) and whether
+# the server accepts byte ranges, so an interrupted download can be resumed instead of started over.
+def read_part_info(partf):
+    try:
+        with open(partf + '.info') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def write_part_info(partf,r):
+    info = {'validator': r.headers.get('ETag') or r.headers.get('Last-Modified'),
+            'accept_ranges': r.headers.get('Accept-Ranges','').lower() == 'bytes'}
+    with open(partf + '.info','w') as f:
+        json.dump(info,f)
+
+def remove_part_info(partf):
+    if os.path.exists(partf + '.info'):
+        os.remove(partf + '.info')
+
+# stream a remote file to disk in fixed size chunks so memory use per worker does not grow with file size.
+# data are written to outf.part and renamed onto outf only once the whole file has arrived.
+# if an earlier run left outf.part behind, only the missing tail is requested (Range: bytes=N-); If-Range
+# makes the server send the whole file instead when it changed since the .part was started.
+# with an algorithm (md5, sha256...) the checksum is computed from the chunks as they are written and
+# returned as 'algorithm:hexdigest', otherwise True comes back; False if the download is incomplete.
+def stream_download(inf,outf,chunk_size=DEFAULT_CHUNK_SIZE,algorithm=None):
+    partf = outf + '.part'
+    headers = {'Accept-Encoding':'identity'}
+    offset = os.path.getsize(partf) if os.path.isfile(partf) else 0
+    info = read_part_info(partf) if offset else {}
+    if offset and info.get('accept_ranges') and info.get('validator'):
+        headers['Range'] = 'bytes={0}-'.format(offset)
+        headers['If-Range'] = info['validator']
+    with host_limits(inf) as slot:
+        r = get_session().get(inf,stream=True,headers=headers)
+        if r.status_code == 416: # .part is already as long as (or longer than) the remote file, start over
+            r.close()
+            headers.pop('Range',None)
+            headers.pop('If-Range',None)
+            r = get_session().get(inf,stream=True,headers=headers)
+        slot.check(r)
+        check_login(r)
+        r.raise_for_status()
+        if 'Range' in headers and r.status_code == 206 and r.headers.get('Content-Range','').startswith('bytes {0}-'.format(offset)):
+            mode = 'ab'
+        else: # server ignored the range or the file changed, full download
+            offset = 0
+            mode = 'wb'
+            write_part_info(partf,r)
+        hasher = newHash(algorithm) if algorithm else None
+        if hasher and offset: # resuming, the part already on disk goes into the checksum first
+            with open(partf,'rb') as f:
+                for block in iter(lambda: f.read(chunk_size),b''):
+                    hasher.update(block)
+        nbytes = offset
+        try:
+            with open(partf,mode) as f:
+                for chunk in r.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        if hasher:
+                            hasher.update(chunk)
+                        nbytes += len(chunk)
+                        slot.progress(len(chunk))
+        finally:
+            r.close()
+    expected = r.headers.get('Content-Length')
+    if expected is not None and offset + int(expected) != nbytes:
+        print('\n {0} did not fully download, kept for resume:'.format(outf))
+        print('\n\t {0} size has {1} bytes.'.format(inf,offset + int(expected)))
+        print('\n\t {0} size has {1} bytes.'.format(partf,nbytes))
+        return False
+    os.replace(partf,outf)
+    remove_part_info(partf)
+    return formatChecksum(algorithm,hasher.hexdigest()) if hasher else True
+
+# fetch one byte range of a segmented download into its place in the preallocated .part file.
+# seg is [start, end, done] with end inclusive and done the number of bytes already on disk.
+def download_segment(inf,partf,seg,validator,chunk_size,status,lock):
+    import requests
+    start, end, done = seg
+    if start + done > end:
+        return
+    headers = {'Accept-Encoding':'identity','Range':'bytes={0}-{1}'.format(start + done,end)}
+    if validator:
+        headers['If-Range'] = validator
+    try:
+        with host_limits(inf) as slot:
+            r = get_session().get(inf,stream=True,headers=headers)
+            slot.check(r)
+            check_login(r)
+            if r.status_code != 206: # server ignored the range or the file changed underneath us
+                r.close()
+                status['changed'] = r.status_code == 200
+                return
+            with open(partf,'r+b') as f:
+                f.seek(start + done)
+                for chunk in r.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        done += len(chunk)
+                        slot.progress(len(chunk))
+            r.close()
+    except login_required:
+        status['login'] = True
+    except requests.exceptions.RequestException as e:
+        print(e)
+    finally:
+        with lock:
+            seg[2] = done
+
+# download a large file as -- nseg -- byte ranges at once, each on its own connection, so one file is
+# not limited to the throughput of a single TCP stream. The .part file is preallocated to the full size
+# and the progress of each range is kept in .part.info, so an interrupted segmented download resumes too.
+# the ranges arrive out of order, so a checksum (returned as for stream_download) takes one pass over the file.
+def segmented_download(inf,outf,size,nseg,chunk_size=DEFAULT_CHUNK_SIZE,validator=None,algorithm=None):
+    partf = outf + '.part'
+    info = read_part_info(partf) if os.path.isfile(partf) else {}
+    if info.get('segments') and info.get('size') == size and (validator is None or info.get('validator') == validator):
+        segments = info['segments']
+        validator = info.get('validator')
+    else:
+        step = -(-size // nseg)  # ceiling division
+        segments = [[start, min(start + step, size) - 1, 0] for start in range(0,size,step)]
+        with open(partf,'wb') as f:
+            f.truncate(size)
+    info = {'validator':validator,'accept_ranges':True,'size':size,'segments':segments}
+    status = {'changed':False,'login':False}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=download_segment,args=(inf,partf,seg,validator,chunk_size,status,lock)) for seg in segments]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if status['login']:
+        with open(partf + '.info','w') as f:
+            json.dump(info,f)
+        raise login_required('{0} needs an Earthdata login'.format(inf))
+    if status['changed']:
+        print('\n {0} changed on the server during a segmented download, starting over.'.format(inf))
+        os.remove(partf)
+        remove_part_info(partf)
+        return False
+    with open(partf + '.info','w') as f:
+        json.dump(info,f)
+    # check the assembled size
+    nbytes = sum(seg[2] for seg in segments)
+    if nbytes != size or os.path.getsize(partf) != size:
+        print('\n {0} did not fully download, kept for resume:'.format(outf))
+        print('\n\t {0} size has {1} bytes.'.format(inf,size))
+        print('\n\t {0} has {1} bytes in {2} segments.'.format(partf,nbytes,len(segments)))
+        return False
+    os.replace(partf,outf)
+    remove_part_info(partf)
+    return hashFile(outf,algorithm,chunk_size) if algorithm else True
+
+# pick a download strategy for one file: files of at least args.segment_threshold bytes on servers that
+# accept ranges are fetched in args.segments pieces at once, everything else is streamed on one connection.
+# remote is the manifest entry for inf. Returns as stream_download does.
+def download_one(inf,outf,args,remote):
+    partf = outf + '.part'
+    info = read_part_info(partf) if os.path.isfile(partf) else {}
+    if args.segments > 1 and (not os.path.isfile(partf) or info.get('segments')):
+        size = remote.get('size') or 0
+        if size >= args.segment_threshold and 'accept_ranges' not in remote:
+            remote = args.manifest.ranges(inf)
+            size = remote.get('size') or 0
+        if size >= args.segment_threshold and remote.get('accept_ranges'):
+            return segmented_download(inf,outf,size,args.segments,args.chunksize,
+                                      remote.get('etag') or remote.get('last_modified'),args.checksum)
+    return stream_download(inf,outf,args.chunksize,args.checksum)
+
+# True if outf is already on disk with the size the manifest has for the remote file
+def is_current(outf,remote,args):
+    return not args.overwrite and os.path.isfile(outf) and remote.get('size') is not None and os.path.getsize(outf) == remote['size']
+
+# call attempt() until it returns something true, at most args.retries more times. Retries wait with
+# exponential backoff and full jitter, a random time up to min(RETRY_MAX_WAIT, args.backoff*2**n) seconds,
+# or as long as a Retry-After header asks. Downloads keep their .part files between attempts, so each
+# retry resumes where the previous one stopped. Errors that retrying cannot fix (404, 403...) give up at once.
+# A request sent to the Earthdata login logs in and tries again straight away.
+def with_retries(attempt,args,what):
+    import requests
+    for n in range(args.retries + 1):
+        wait = random.uniform(0,min(RETRY_MAX_WAIT,args.backoff*2**n))
+        seen = login_state['count']
+        try:
+            result = attempt()
+            if result:
+                return result
+        except login_required as e:
+            if not login(seen):
+                return None
+            continue
+        except requests.exceptions.RequestException as e:
+            print('\n {0}: {1}'.format(what,e))
+            response = getattr(e,'response',None)
+            if response is not None:
+                if 400 <= response.status_code < 500 and response.status_code not in (408,429):
+                    return None
+                retry_after = response.headers.get('Retry-After','')
+                if retry_after.isdigit():
+                    wait = max(wait,min(RETRY_MAX_WAIT,int(retry_after)))
+        if n < args.retries:
+            time.sleep(wait)
+    return None
+
+# bring one remote file up to date. Returns (status, checksum): status is 'skipped' if outf already matches
+# the manifest, otherwise 'downloaded' or, once the retries are used up, 'failed'. checksum is the
+# 'algorithm:hexdigest' computed while downloading, None if none was.
+def pull_one(inf,outf,listed,args):
+    def attempt():
+        remote = args.manifest.entry(inf,listed)
+        if is_current(outf,remote,args):
+            return 'skipped', None
+        # size is checked against Content-Length of the same response, no second request needed
+        result = download_one(inf,outf,args,remote)
+        if result:
+            return 'downloaded', result if result is not True else None
+        return None
+    return with_retries(attempt,args,inf) or ('failed', None)
+
+# download file_list one at a time, returns the urls that failed
+def download_files(url,args,dirpath,file_list,details=None):
+    details = details or {}
+    failed = []
     for file in file_list:
         outfile = args.outpath + '/' + dirpath + file
         fullpath = url + dirpath + file
 
         # if the file is in the path, and it's the right size, skip.
-        if os.path.isfile(outfile) and (int(os.path.getsize(outfile)) == int(requests.get(fullpath,stream=True).headers['Content-Length']) and not args.overwrite):
+        status, checksum = pull_one(fullpath,outfile,details.get(file),args)
+        if status == 'skipped':
             print('Skipping: ',outfile )
+        elif status == 'failed':
+            failed.append(fullpath)
         else:
-            print('Downloading: ',outfile)
-            try:
-                r = requests.get(fullpath)             
-            except requests.exceptions.RequestException as e:
-                print(e)
-                exit(-1)
-            with open(outfile,'wb') as f:
-                 f.write(r.content)
-
-def download_filesTh(url,args,dirpath,file_list):
-#    def web_file_size(inf):
-#        if inf.endswith( ('.txt','.xml')):
-#            return len(requests.get(inf).content)
-#        else:
-#            return int(requests.get(inf,stream=True).headers['Content-Length'])
+            print('Downloaded: ',outfile)
+    return failed
+
+def download_filesTh(url,args,dirpath,file_list,details=None):
+    from runMyThreads import runMyThreads
+    details = details or {}
+    failed = []
                        
-    def do_one(outf,inf):        
-        if os.path.isfile(outf) and (int(os.path.getsize(outf)) == int(requests.get(inf,stream=True).headers['Content-Length']) and not args.overwrite):
-            pass #print('Skipping: ',outf )
-        else:
-            try:
-                r = requests.get(inf)             
-            except requests.exceptions.RequestException as e:
-                print(e)
-                exit(-1)
-            with open(outf,'wb') as f:
-                f.write(r.content)    
-            # check size after download
-            if not int(os.path.getsize(outf)) == int(requests.get(inf,stream=True).headers['Content-Length']):
-                print('\n {0} did not fully download:'.format(outf))
-                print('\n\t {0} size has {1} bytes.'.format(inf,int(requests.get(inf,stream=True).headers['Content-Length'])))
-                print('\n\t {0} size has {1} bytes.'.format(outf,int(os.path.getsize(outf))))
-                exit(-1)
+    def do_one(outf,inf,listed):
+        if pull_one(inf,outf,listed,args)[0] == 'failed':
+            failed.append(inf)
             
     threads = []
     for file in file_list:
@@ -374,19 +559,426 @@ def download_filesTh(url,args,dirpath,file_list):
             fullpath = url + dirpath + file   
         else:
             fullpath = url + file
-        t = threading.Thread(target=do_one, args=(outfile,fullpath))
+        t = threading.Thread(target=do_one, args=(outfile,fullpath,details.get(file)))
         threads.append(t)
         
     msg = 'Downloading ' + dirpath
-    runMyThreads(threads,10,msg,prompt=False)
+    runMyThreads(threads,args.threads,msg,prompt=False)
+    return failed
     
 def download_prod(urldir_path,args,nsidc_url):
     if nsidc_url in urldir_path:
         local_dirname = urldir_path.replace(nsidc_url,'')
         establish_dir(args.outpath  + '/' + local_dirname)
-        fl,dl = get_names(urldir_path,args)
+        fl,dl,details = get_listing(urldir_path,args)
         
-        download_filesTh(urldir_path,args,local_dirname,fl)
+        return download_filesTh(urldir_path,args,local_dirname,fl,details)
+    return []
+
+# connections to one server the adaptive limit may grow to from args.threads: args.threads files of
+# args.segments ranges each. pull_products starts this many workers and host_limits holds back the ones
+# the server has not shown it can take yet.
+def max_connections(args):
+    return args.threads*max(1,args.segments)
+
+# download a product as a pipeline: the crawl feeds files into a bounded queue as soon as their directory
+# has been listed, max_connections workers download from it without waiting at directory boundaries, and a
+# verification stage checks every finished file against the manifest size and, when its .xml sidecar
+# publishes one, the checksum computed while it streamed in, and records it in args.state.
+# Files args.state already has as verified are left out before they reach the queue, and so are the files
+# of other shards with --shard. listings, when given, replaces the crawl with (urldir, depth, files, dirs,
+# details) tuples of its own. Returns the urls that failed.
+def pull_product(url,args,listings=None):
+    return pull_products([(url,args,listings)],args)
+
+# pull_product for several products at once: jobs are (url, product args, listings) and every product is
+# crawled in its own thread, all feeding the same queue, workers and verification stage, so one run
+# mirrors a stack of products with the downloads host_limits allows in flight between them. Each product keeps
+# its own outpath, filters, manifest and state database in its args.
+def pull_products(jobs,args):
+    nworkers = max_connections(args)
+    todo = queue.Queue(maxsize=2*nworkers)
+    finished = queue.Queue()
+    counts = {'found':0,'skipped':0,'downloaded':0,'failed':0}
+    counts_lock = threading.Lock()
+    failed = []
+    errors = []
+
+    def count(status):
+        with counts_lock:
+            counts[status] += 1
+            print('Found {found:6}  skipped {skipped:6}  downloaded {downloaded:6}  failed {failed:6}'.format(**counts),end='\r')
+            sys.stdout.flush()
+
+    # every worker posts None when it stops, however it stops, for verify_stage to know when all are done
+    def download_stage():
+        try:
+            while True:
+                job = todo.get()
+                if job is None:
+                    return
+                pargs, inf, outf, listed, urldir, sidecar = job
+                start = time.time()
+                try:
+                    status, checksum = pull_one(inf,outf,listed,pargs)
+                except Exception as e:   # e.g. an OSError writing the file: it fails, the worker goes on
+                    print('\n {0}: {1}'.format(inf,e))
+                    status, checksum = 'failed', None
+                finished.put((pargs,inf,outf,listed,urldir,sidecar,status,checksum,time.time() - start))
+        finally:
+            finished.put(None)
+
+    # data files that finished before the granule metadata (.xml sidecar) holding their checksum, by sidecar
+    awaiting = {}
+
+    def fail(pargs,inf,outf,remote,listed,urldir):
+        failed.append(inf)
+        pargs.state.record(inf,urldir,outf,remote,listed,'failed')
+
+    def matches_sidecar(outf,checksum,sidecar):
+        if checkPublished(outf,checksum,sidecar) is False:
+            print('\n {0} does not match the checksum published in {1}, removed.'.format(outf,sidecar))
+            os.remove(outf)
+            return False
+        return True
+
+    def verify_stage():
+        running = nworkers
+        while running:
+            item = finished.get()
+            if item is None:
+                running -= 1
+                continue
+            try:
+                verify_one(*item)
+            except Exception as e:
+                # a file or state database that can not be read fails the file, the workers are still drained
+                print('\n {0}: {1}'.format(item[1],e))
+                failed.append(item[1])
+                count('failed')
+
+    # check and record one file a worker finished with
+    def verify_one(pargs, inf, outf, listed, urldir, sidecar, status, checksum, elapsed):
+        remote = pargs.manifest.get(inf)
+        expected = remote.get('size')
+        if status == 'downloaded' and expected is not None and os.path.getsize(outf) != expected:
+            print('\n {0} does not match the size listed for {1}.'.format(outf,inf))
+            status = 'failed'
+        # a checksum the --input order gave for the file
+        if status == 'downloaded' and (listed or {}).get('checksum'):
+            if not checkExpected(outf,checksum,listed['checksum']):
+                print('\n {0} does not match the checksum in the order, removed.'.format(outf))
+                os.remove(outf)
+                status = 'failed'
+        if status == 'downloaded' and sidecar:
+            if os.path.isfile(sidecar):
+                if not matches_sidecar(outf,checksum,sidecar):
+                    status = 'failed'
+            else:
+                awaiting.setdefault(sidecar,[]).append((pargs,inf,outf,remote,listed,urldir,checksum))
+        if status == 'failed':
+            fail(pargs,inf,outf,remote,listed,urldir)
+        else:
+            pargs.state.record(inf,urldir,outf,remote,listed,'ok',elapsed if status == 'downloaded' else None,checksum)
+            # granule metadata places its region for later --bbox/--point queries
+            if pargs.regions is not None and outf.endswith('.xml'):
+                relpath = os.path.relpath(outf,pargs.outpath).split(os.sep)
+                pargs.regions.addGranule(relpath[0] + '/',relpath[-1],outf)
+        count(status)
+        # a sidecar that arrived late checks the files that were waiting for it
+        for w_pargs, w_inf, w_outf, w_remote, w_listed, w_urldir, w_checksum in awaiting.pop(outf,[]):
+            if status != 'failed' and not matches_sidecar(w_outf,w_checksum,outf):
+                fail(w_pargs,w_inf,w_outf,w_remote,w_listed,w_urldir)
+                with counts_lock:
+                    counts['downloaded'] -= 1
+                count('failed')
+
+    # files still waiting once everything is verified: their sidecar was not part of this run (another
+    # shard, already here and not listed again) but may be on disk, otherwise they are only reported
+    def settle_awaiting():
+        unchecked = []
+        for sidecar, waiting in awaiting.items():
+            for w_pargs, w_inf, w_outf, w_remote, w_listed, w_urldir, w_checksum in waiting:
+                if not os.path.isfile(sidecar):
+                    unchecked.append(w_outf)
+                elif not matches_sidecar(w_outf,w_checksum,sidecar):
+                    fail(w_pargs,w_inf,w_outf,w_remote,w_listed,w_urldir)
+        awaiting.clear()
+        if unchecked:
+            print('{0} files could not be checked, their granule metadata was not downloaded:'.format(len(unchecked)))
+            for outf in unchecked:
+                print(' ' + outf)
+
+    # crawl and filter stages, one per product: select_subdirs has already dropped directories outside
+    # the requested dates, region and type by the time a listing comes out of the crawl. An --input order
+    # has no product url, its files go below outpath by server and path (order_dirname).
+    def feed_stage(url,pargs,listings):
+        discovered = []
+        try:
+            for urldir, depth, files, dirs, details in (crawl_product(url,pargs,failed) if listings is None else listings):
+                local_dirname = urldir.replace(url,'') if url else order_dirname(urldir)
+                discovered += [local_dirname + file for file in files]
+                files = [file for file in files if inShard(local_dirname + file,pargs.shard)]
+                if files:
+                    establish_dir(pargs.outpath + '/' + local_dirname)
+                # the delta against what was verified before, without asking the server about each file
+                done = set() if pargs.overwrite else pargs.state.verified(urldir,details)
+                for file in files:
+                    with counts_lock:
+                        counts['found'] += 1
+                    if file in done:
+                        count('skipped')
+                        if pargs.regions is not None and file.endswith('.xml'):
+                            region = local_dirname.split('/')[0] + '/'
+                            if not pargs.regions.hasGranule(region,file):
+                                pargs.regions.addGranule(region,file,pargs.outpath + '/' + local_dirname + file)
+                    else:
+                        # the granule metadata in the same directory, if any, to check the checksum against
+                        sidecar = next((name for name in sidecarsFor(file) if name in details),None) if pargs.checksum else None
+                        todo.put((pargs, urldir + file, pargs.outpath + '/' + local_dirname + file, details.get(file), urldir,
+                                  pargs.outpath + '/' + local_dirname + sidecar if sidecar else None))
+        except BaseException as e:   # handed to the main thread once the files already queued are done
+            errors.append(e)
+            return
+        if pargs.shard:
+            write_shard_record(url,discovered,pargs)
+
+    workers = [threading.Thread(target=download_stage) for n in range(nworkers)]
+    verifier = threading.Thread(target=verify_stage)
+    feeders = [threading.Thread(target=feed_stage,args=job) for job in jobs]
+    for t in workers + [verifier]:
+        t.start()
+    try:
+        for t in feeders:
+            t.daemon = True
+            t.start()
+        for t in feeders:
+            while t.is_alive():
+                t.join(1.)   # in steps, so Ctrl-C still gets through
+    finally:
+        for t in workers:
+            todo.put(None)
+        verifier.join()
+    print()
+    settle_awaiting()
+    if errors:
+        raise errors[0]
+    return failed
+
+# what a shard found and where it is up to, in <outpath>/.shard<i>of<N>.json: every file the crawl found,
+# for --verify --merge to check that the shards between them covered all of them
+def write_shard_record(url,discovered,args):
+    record = {'url':url,'shard':list(args.shard),'finished':time.strftime('%Y-%m-%dT%H:%M:%S'),'files':sorted(discovered)}
+    path = os.path.join(args.outpath,shardSuffix(args.shard) + '.json')
+    with open(path + '.tmp','w') as f:
+        json.dump(record,f)
+    os.replace(path + '.tmp',path)
+
+# --verify --merge N: fold the manifests and state databases of shards 1/N..N/N into the product's own and
+# check coverage: every file any shard found must have been downloaded and verified by the shard it belongs
+# to. Returns {local path: (url, problem)} of the files that were not, for verify_product's report and --repair.
+def merge_shards(url,args,nshards):
+    found = set()
+    missing_shards = []
+    for i in range(1,nshards + 1):
+        suffix = shardSuffix((i,nshards))
+        try:
+            with open(os.path.join(args.outpath,suffix + '.json')) as f:
+                record = json.load(f)
+            found.update(record['files'])
+        except (IOError, ValueError):
+            missing_shards.append('{0}/{1}'.format(i,nshards))
+        manifest = remote_manifest(os.path.join(args.outpath,'.remote_manifest' + suffix + '.json'))
+        args.manifest.entries.update(manifest.entries)
+        state = os.path.join(args.outpath,'.download_state' + suffix + '.sqlite')
+        if os.path.isfile(state):
+            args.state.merge(state)
+    args.manifest.save()
+    if missing_shards:
+        print('No record from shard {0}, it has not finished a pull yet.'.format(', '.join(missing_shards)))
+    done = args.state.done()
+    uncovered = {}
+    for relpath in sorted(found):
+        inf = url + relpath
+        path = os.path.normpath(os.path.join(args.outpath,relpath))
+        if inf not in done or not os.path.isfile(path) or os.path.getsize(path) != done[inf][1]:
+            uncovered[path] = (inf,'not downloaded by shard {0}/{1}'.format(shardOf(relpath,nshards),nshards))
+    for path in sorted(uncovered):
+        print('{0} {1}'.format(path,uncovered[path][1]))
+    print('Shards 1/{0}..{0}/{0} cover {1} of the {2} files found.'.format(nshards,len(found) - len(uncovered),len(found)))
+    return uncovered
+
+# --verify: check the local tree of a product against the remote manifest of the last pull, then re-hash it
+# on all cores. Files the manifest lists are missing when they are not on disk and truncated when their size
+# differs from the remote one; every other file is checked against the checksum published in its .xml sidecar,
+# or else the one recorded when it was downloaded. Returns {local path: (url or None, problem)} of the bad files.
+def verify_product(url,args):
+    from concurrent.futures import ProcessPoolExecutor
+    manifest = remote_manifest(os.path.join(args.outpath,'.remote_manifest.json'))
+    recorded = args.state.checksums()
+    expected = {}
+    for inf, remote in manifest.entries.items():
+        if inf.startswith(url):
+            expected[os.path.normpath(os.path.join(args.outpath,inf[len(url):]))] = (inf,remote.get('size'))
+    paths = []
+    for root, dirnames, filenames in os.walk(args.outpath):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        paths += [os.path.normpath(os.path.join(root,f)) for f in sorted(filenames) if not f.startswith('.') and not f.endswith(('.part','.part.info'))]
+    bad = {}
+    counts = {'missing':0,'truncated':0,'corrupt':0}
+    on_disk = set(paths)
+    for path, (inf, size) in expected.items():
+        if path not in on_disk:
+            bad[path] = (inf,'missing')
+            counts['missing'] += 1
+        elif size is not None and os.path.getsize(path) != size:
+            bad[path] = (inf,'truncated, {0} of {1} bytes'.format(os.path.getsize(path),size))
+            counts['truncated'] += 1
+    # only files of the right size are worth reading, each worker maps them into memory to hash them
+    paths = [path for path in paths if path not in bad]
+    with ProcessPoolExecutor() as pool:
+        for path, problem in pool.map(verifyOne,paths,[recorded.get(p) for p in paths],chunksize=4):
+            if problem:
+                bad[path] = (expected.get(path,(None,None))[0],problem)
+                counts['corrupt'] += 1
+    for path in sorted(bad):
+        print('{0} {1}'.format(path,bad[path][1]))
+    print('Verified {0} files in {1}: {missing} missing, {truncated} truncated, {corrupt} corrupt.'.format(len(on_disk),args.outpath,**counts))
+    return bad
+
+# --verify --repair: remove the bad files and hand their urls to pull_product as listings grouped by
+# directory, so only they are downloaded again. Files the manifest does not know the url of stay as they are.
+def repair_listings(bad,args):
+    urls = []
+    for path, (inf, problem) in sorted(bad.items()):
+        if inf is None:
+            print('{0} is not in the remote manifest, can not repair it.'.format(path))
+            continue
+        if os.path.exists(path):
+            os.remove(path)
+        urls.append((inf,args.manifest.get(inf).get('listed')))
+    return group_listings(urls)
+
+# (urldir, depth, files, dirs, details) listings for pull_product made up from (url, listing details) pairs,
+# one per directory, for downloading a known set of files without crawling
+def group_listings(urls):
+    by_dir = {}
+    for inf, listed in urls:
+        urldir, name = inf.rsplit('/',1)
+        by_dir.setdefault(urldir + '/',{})[name] = listed
+    for urldir in sorted(by_dir):
+        yield urldir, None, sorted(by_dir[urldir]), [], by_dir[urldir]
+
+# where the files of the order directory urldir go below the order's outpath: server/path/, as wget -x
+# lays them out, so files of the same name from different directories or servers stay apart
+def order_dirname(urldir):
+    parts = urlparse(urldir)
+    dirs = [d for d in parts.path.split('/') if d not in ('','.','..')]
+    return '/'.join([parts.netloc.replace(':','_')] + dirs) + '/'
+
+# --input: listings for pull_product as the order file is read (see orderFile), up to ORDER_BATCH files of
+# one directory at a time, so the first files are downloading while the rest of a large order is parsed.
+# The size and checksum the order gives go along as listing details: an exact size spares the HEAD request
+# and lets files already here be skipped, the checksum is checked in the verification stage.
+def order_listings(entries,batch=ORDER_BATCH):
+    urldir, details = None, {}
+    for entry in entries:
+        entry_dir, name = entry['url'].rsplit('/',1)
+        if not name or not urlparse(entry['url']).path:
+            raise ValueError('{0} is not the url of a file'.format(entry['url']))
+        if details and (entry_dir + '/' != urldir or len(details) >= batch):
+            yield urldir, None, list(details), [], details
+            details = {}
+        urldir = entry_dir + '/'
+        details[name] = {key:str(entry[key]) for key in ('size','checksum') if key in entry}
+    if details:
+        yield urldir, None, list(details), [], details
+
+# bytes in a size column of a listing: exact when the server prints bytes, else from 7.3M, 512K, 1.2G
+def listed_size(listed):
+    m = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)\s*$',(listed or {}).get('size',''),re.I)
+    if m is None:
+        return None
+    return int(float(m.group(1))*1024**' KMGT'.index(m.group(2).upper() or ' '))
+
+def format_bytes(nbytes):
+    for unit in ('bytes','KB','MB','GB','TB'):
+        if abs(nbytes) < 1024 or unit == 'TB':
+            return '{0:.1f} {1}'.format(nbytes,unit) if unit != 'bytes' else '{0} bytes'.format(int(nbytes))
+        nbytes /= 1024.
+
+# --pull --dryrun: crawl and filter as the pull would (using the listing cache), and report how many files
+# and bytes it would fetch, how much of that is already here, and how long the rest should take at the
+# throughput args.state measured for the last downloads. Sizes come from the manifest where it knows the
+# file as listed, otherwise from the listing, rounded as the server prints them. With --plan the files are
+# written to that file as JSON, for a later --pull --plan to download without crawling again.
+def plan_product(url,args):
+    plan = {'product':args.prod,'url':url,'created':time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'firstdate':str(args.dates[0]),'lastdate':str(args.dates[1]),'region':args.region,'type':args.type,
+            'files':[],'unlisted':[]}
+    totals = {'files':0,'bytes':0,'present':0,'present_bytes':0,'todo':0,'todo_bytes':0,'unknown':0}
+    for urldir, depth, files, dirs, details in crawl_product(url,args,plan['unlisted']):
+        local_dirname = urldir.replace(url,'')
+        done = set() if args.overwrite else args.state.verified(urldir,details)
+        for file in [file for file in files if inShard(local_dirname + file,args.shard)]:
+            inf = urldir + file
+            outf = args.outpath + '/' + local_dirname + file
+            listed = details.get(file)
+            known = args.manifest.get(inf)
+            size = known.get('size') if known.get('listed') == listed and known.get('size') is not None else listed_size(listed)
+            if file in done or (size is not None and is_current(outf,{'size':size},args)):
+                status, present = 'present', size or 0
+            else:
+                status = 'todo'
+                present = os.path.getsize(outf + '.part') if os.path.isfile(outf + '.part') and not args.overwrite else 0
+            totals['files'] += 1
+            totals['bytes'] += size or 0
+            totals['unknown'] += size is None
+            totals['present_bytes'] += min(present,size or present)
+            totals[status] += 1
+            if status == 'todo':
+                totals['todo_bytes'] += max(0,(size or 0) - present)
+            plan['files'].append({'url':inf,'path':outf,'listed':listed,'size':size,'status':status})
+    print('Plan for product {0}: {1} files, {2}'.format(args.prod,totals['files'],format_bytes(totals['bytes'])))
+    print('  already here:  {0} files, {1} counting partial downloads'.format(totals['present'],format_bytes(totals['present_bytes'])))
+    print('  to download:   {0} files, {1}'.format(totals['todo'],format_bytes(totals['todo_bytes'])))
+    if totals['unknown']:
+        print('  sizes of {0} files are not in the listing and not counted'.format(totals['unknown']))
+    rate = args.state.throughput()
+    if rate:
+        eta = datetime.timedelta(seconds=int(totals['todo_bytes']/rate))
+        print('  estimated time: {0} at {1}/s, as measured over the last downloads'.format(eta,format_bytes(rate)))
+    else:
+        print('  estimated time: unknown until something has been downloaded for this product')
+    if plan['unlisted']:
+        print('  {0} directories could not be listed, their files are not in the plan'.format(len(plan['unlisted'])))
+    if args.plan:
+        plan['totals'] = totals
+        with open(args.plan,'w') as f:
+            json.dump(plan,f,indent=1)
+        use_msg('Plan written to {0}, run it with --pull {1} --plan {0}.'.format(args.plan,args.prod))
+    return plan
+
+# --pull --plan: the files of a plan written by --dryrun, as listings for pull_product
+def read_plan(path,url):
+    try:
+        with open(path) as f:
+            plan = json.load(f)
+    except (IOError, ValueError) as e:
+        exit_msg('Can not read the plan {0}: {1}'.format(path,e))
+    if plan.get('url') != url:
+        exit_msg('The plan {0} is for {1}, not {2}.'.format(path,plan.get('url'),url))
+    return group_listings((item['url'],item['listed']) for item in plan['files'])
+
+# save what the products learnt so far and stop with msg, for a run that can not go on (e.g. a --region
+# the server does not have, found once the crawl gets there)
+def stop_msg(msg,products):
+    for pargs in products:
+        if getattr(pargs,'manifest',None) is not None:
+            pargs.manifest.save()
+        if pargs.regions is not None:
+            pargs.regions.save()
+    exit_msg(msg)
 
 def help_msg(keys):
     message = "GIMP NSIDC dataset numbers available for download: %s. Use -pd for descriptions" % ' \n'.join([str(key) for key in keys])  # \n doesn't work
@@ -403,28 +995,215 @@ def exit_msg(msg):
     
 ############################################################################
 
+# productPaths.csv in the current directory, which lets a local copy override the product table,
+# or else the one next to this script, so getgimp.py runs from anywhere
+def product_paths():
+    if os.path.isfile('productPaths.csv'):
+        return 'productPaths.csv'
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)),'productPaths.csv')
+
+# the args of one product: a copy of args with the filters and output root of its job (see jobFile)
+# applied, checked and put in the form the crawl and download functions use
+def product_args(args,job):
+    pargs = copy.copy(args)
+    for key in ('region','firstdate','lastdate','type','byname','bbox','point'):
+        if key in job:
+            setattr(pargs,key,job[key])
+    pargs.prod = job['product']
+    try:
+        pargs.url = prod_path[pargs.prod][args.dival['url']]
+    except KeyError:
+        exit_msg('Product number %s is not available. Use --description for current list.' % pargs.prod)    
+    level = prod_path[pargs.prod][args.dival['dateLevel']]
+
+    # with several products, --region, --bbox and --point on the command line are for the ones with
+    # region directories; a job that sets them for a product without regions is still an error
+    if len(args.prodpull or []) > 1 and level != 2:
+        for key, default in (('region',''),('bbox',None),('point',None)):
+            if key not in job:
+                setattr(pargs,key,default)
+
+    if pargs.region != 'all': 
+        pargs.region = check_region_name(pargs.region)
+    
+    if pargs.region and level<=1:
+        exit_msg('This product, %s, does not have regions.' % pargs.prod)
+
+    # where the regions are is learnt from their names and granule metadata as they are listed and pulled,
+    # for --bbox/--point to pick them by
+    pargs.area = parse_area(pargs.bbox,pargs.point)
+    pargs.regions = regionCatalog(os.path.join(REGION_CATALOG_PATH,pargs.prod + '.json')) if level == 2 else None
+    if pargs.area:
+        if level != 2:
+            exit_msg('Product {0} has no region directories to pick by --bbox or --point.'.format(pargs.prod))
+        pargs.region = pargs.region or 'all'
+        
+    pargs.outpath = job.get('outpath') or os.path.join(args.outroot,pargs.prod)
+    
+    # put --firstdate and --lastdate arguments into datetime.date format
+    try:
+        yf,mf,df = [int(item) for item in pargs.firstdate.split('-')]
+        firstdate = datetime.date(yf,mf,df)  
+        yl,ml,dl = [int(item) for item in pargs.lastdate.split('-')]
+        lastdate = datetime.date(yl,ml,dl)      
+    except ValueError:
+        exit_msg('Dates are given as yyyy-mm-dd, not {0} and {1}.'.format(pargs.firstdate,pargs.lastdate))
+    # dates in directory names, compiled once for the product; widen the dates to what the names resolve
+    try:
+        pargs.date_pattern = datePattern(prod_path[pargs.prod][args.dival['dateFormat']])
+    except ValueError as e:
+        exit_msg('productPaths.csv: {0}'.format(e))
+    firstdate, lastdate = pargs.date_pattern.queryRange(firstdate,lastdate)
+
+    if level == 0 and pargs.region:
+        exit_msg('Product {0} does not have directories separated by region or dates.'.format(pargs.prod))
+
+    # ensure a / on the end
+    if pargs.type:
+        pargs.type = pargs.type.strip('/') + '/'
+    if pargs.byname:
+        pargs.byname = pargs.byname.strip('/') + '/'
+        if firstdate == datetime.date(1900,1,1) and lastdate == datetime.date(2100,1,1):
+            firstdate = datetime.date(2100,1,1)   # if by name, dont get by dates
+            lastdate = datetime.date(1900,1,1)
+    pargs.dates = (firstdate,lastdate)
+    pargs.watch_newest = 0
+    return pargs
+
+# the args of an --input order: its files, manifest and state database go in <outroot>/<order file name>,
+# as a product's do in <outroot>/<product>. There is no product url, so none of the product filters apply.
+def input_args(args,path):
+    pargs = copy.copy(args)
+    pargs.prod = os.path.splitext(os.path.basename(path))[0]
+    pargs.url = None
+    pargs.outpath = os.path.join(args.outroot,pargs.prod)
+    pargs.regions = None
+    pargs.area = None
+    pargs.watch_newest = 0
+    return pargs
+
+# --watch: pull the products again every args.watch seconds, until Ctrl-C. The first round is a full pull,
+# after it only the args.newest newest date directories (and the directories above them) are looked at,
+# revalidated with conditional requests through the listing cache, so a round where nothing changed costs a
+# 304 per directory and new granules go into the pipeline as soon as their directory lists them. The session,
+# login and connection limits stay up between rounds. <outpath>/.watch_status.json has when each product was
+# last checked and the newest granule downloaded.
+def watch_products(products,args):
+    rounds = 0
+    while True:
+        start = time.time()
+        for pargs in products:
+            pargs.watch_newest = args.newest if rounds else 0
+        try:
+            failed = pull_products([(pargs.url,pargs,None) for pargs in products],args)
+        except ValueError:   # a bad --region or the like, no point in trying again
+            raise
+        except Exception as e:   # the server may be down for a while, try again next round
+            print('\n Round {0} stopped: {1}'.format(rounds + 1,e))
+            failed = None
+        for pargs in products:
+            pargs.manifest.save()
+            if pargs.regions is not None:
+                pargs.regions.save()
+            write_watch_status(pargs,start,failed)
+        rounds += 1
+        wait = max(0,args.watch - (time.time() - start))
+        print('Round {0} done at {1}, {2} failed, next in {3:.0f} s'.format(rounds,time.strftime('%Y-%m-%d %H:%M:%S'),
+                                                                        len(failed) if failed is not None else 'all',wait))
+        sys.stdout.flush()
+        time.sleep(wait)
+
+def write_watch_status(pargs,start,failed):
+    last = pargs.state.lastDownload()
+    status = {'product':pargs.prod,'url':pargs.url,
+              'last_checked':time.strftime('%Y-%m-%dT%H:%M:%S',time.localtime(start)),
+              'last_round_ok':failed is not None,
+              'failed':sorted(inf for inf in (failed or []) if inf.startswith(pargs.url)),
+              'last_granule':last[0] if last else None,
+              'last_granule_at':time.strftime('%Y-%m-%dT%H:%M:%S',time.localtime(last[1])) if last else None}
+    path = os.path.join(pargs.outpath,'.watch_status.json')
+    with open(path + '.tmp','w') as f:
+        json.dump(status,f,indent=1)
+    os.replace(path + '.tmp',path)
+
+# (west, south, east, north) from --bbox W,S,E,N or --point LON,LAT, None without either
+def parse_area(bbox,point):
+    try:
+        if bbox:
+            west, south, east, north = [float(item) for item in bbox.split(',')]
+        elif point:
+            west, south = [float(item) for item in point.split(',')]
+            east, north = west, south
+        else:
+            return None
+    except ValueError:
+        exit_msg('Use --bbox=W,S,E,N and --point=LON,LAT in decimal degrees, e.g. --bbox=-52,68.5,-48,70.')
+    if south > north or west > east:
+        exit_msg('--bbox is west,south,east,north, with west <= east and south <= north.')
+    return (west,south,east,north)
+
+# dateLevel = 2 without a region: only show what regions there are, and pull the files at the top
+def show_regions(url,args):
+    failed = []
+    files, dirs = get_names(url,args)
+    [print('file: ',file) for file in files if args.prodlist if files]     
+    if args.prodlist and not args.verbose:
+        use_msg('Use --verbose to see file listing for product {0}.'.format(args.prod))
+        
+    if files and args.prodpull and not args.dryrun:
+        failed = download_prod(url,args,url)
+    
+    if dirs:
+        for dirname in dirs:
+            print(dirname)
+        use_msg('Use --region REGION or --region all to list or download files for product {0}.'.format(args.prod))
+    return failed
+
 if __name__ == '__main__':
     
     # read product names and their urls.
     try:   
-        with open('productPaths.csv') as csvfile:
+        with open(product_paths()) as csvfile:
             rows = csv.reader(csvfile)
             prod_path = {row[0]:[int(row[1]),row[2],row[3].strip(),row[4].strip()] for row in rows}   # product number : [#dir levels, date format in directory name, product description, url-path to product]
         dival = {'dateLevel':0,'dateFormat':1,'description':2,'url':3}
     except:
-        use_msg('Need productPaths.csv file containing path info.')
+        use_msg('Need productPaths.csv file containing path info, in the current directory or next to getgimp.py.')
     
     # parse command line arguments
     parser = argparse.ArgumentParser(description='Retrieves GIMP files of specified products.')    
     # add parameters to parse
     parser.add_argument('-l', '--list', dest='prodlist', metavar='product number', help=help_msg(prod_path.keys()),default=None)  
-    parser.add_argument('-p', '--pull', dest='prodpull', metavar='product number', help='product name',default=None) 
+    parser.add_argument('-p', '--pull', dest='prodpull', metavar='product number', nargs='+', help='product name, or several to pull together',default=None) 
+    parser.add_argument('-j', '--jobs', dest='jobs', metavar='FILE', help='pull the products listed in a .toml or .yaml job file, each with its own filters and outpath (see jobFile.py)',default=None)
+    parser.add_argument('-in','--input', dest='input', metavar='FILE', help='pull the files of an order: a metalink (.metalink, .meta4), a CSV with a URL column or a list of urls, e.g. from Earthdata Search or Vertex, into OUTROOT/<order name>/<server>/<path>',default=None)
+    parser.add_argument('-or','--outroot', dest='outroot', metavar='DIR', help='download products to DIR/<product> (default .)',default='.')
+    parser.add_argument('-vf','--verify', dest='prodverify', metavar='product number', help='check the files already downloaded for a product against the remote manifest and their checksums, report the missing, truncated and corrupt ones',default=None)
+    parser.add_argument('-rp','--repair', action='store_true', help='with --verify, download the missing, truncated and corrupt files again')
     parser.add_argument('-r', '--region', dest='region', help='options: regional glacier box name (e.g., Wcoast-69.10N), all',default='')
+    parser.add_argument('-bb','--bbox', dest='bbox', metavar='W,S,E,N', help='only the regions meeting this box in decimal degrees (e.g., --bbox=-52,68.5,-48,70), for products with regions',default=None)
+    parser.add_argument('-pt','--point', dest='point', metavar='LON,LAT', help='only the regions holding this point in decimal degrees (e.g., --point=-49.8,69.2)',default=None)
     parser.add_argument('-fd','--firstdate', dest='firstdate', help='first date as yyyy-mm-dd',default='1900-01-01')
     parser.add_argument('-ld','--lastdate', dest='lastdate', help='last date as yyyy-mm-dd',default='2100-01-01')
     parser.add_argument('-t', '--type', dest='type', metavar='mosaic type', help='mosaic type for cases with multiple resolutions (e.g., 20byte for 0633/2005_2006/20byte)',default='')
     parser.add_argument('-name', '--byname', dest='byname', metavar='non-date directory name', help='for products with non-date derived names (e.g., multiyear_composite for 0633/multiyear_composite).' ,default='')
     parser.add_argument('-o', '--overwrite', action='store_true', help='download files even if they already exist')
+    parser.add_argument('-th','--threads', dest='threads', type=int, metavar='N', help='files to download at once to start with, more while the server keeps up (default %d)' % DEFAULT_THREADS,default=DEFAULT_THREADS)
+    parser.add_argument('-rt','--retries', dest='retries', type=int, metavar='N', help='times to retry a failed download, resuming where it stopped (default %d)' % DEFAULT_RETRIES,default=DEFAULT_RETRIES)
+    parser.add_argument('-bo','--backoff', dest='backoff', type=float, metavar='seconds', help='first retry waits up to this long, doubling with every retry (default 1)',default=1.)
+    parser.add_argument('-ck','--checksum', dest='checksum', choices=['md5','sha1','sha256','none'], help='checksum computed while downloading, checked against the granule .xml metadata when it publishes one (default md5)',default='md5')
+    parser.add_argument('-cs','--chunksize', dest='chunksize', type=int, metavar='bytes', help='bytes held in memory per download thread (default %d)' % DEFAULT_CHUNK_SIZE,default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('-sg','--segments', dest='segments', type=int, metavar='N', help='download files above --segmentthreshold as N byte ranges at once, 1 to disable (default %d)' % DEFAULT_SEGMENTS,default=DEFAULT_SEGMENTS)
+    parser.add_argument('-st','--segmentthreshold', dest='segment_threshold', type=int, metavar='bytes', help='smallest file to download in segments (default %d)' % DEFAULT_SEGMENT_THRESHOLD,default=DEFAULT_SEGMENT_THRESHOLD)
+    parser.add_argument('-ttl','--listingttl', dest='listing_ttl', type=float, metavar='seconds', help='reuse cached directory listings younger than this without asking the server (default 0, always revalidate)',default=0)
+    parser.add_argument('-off','--offline', action='store_true', help='only use cached directory listings, never ask the server for them')
+    parser.add_argument('-nc','--nocache', action='store_true', help='do not read or write the directory listing cache in %s' % LISTING_CACHE_PATH)
+    parser.add_argument('-dr','--dryrun', action='store_true', help='with --pull, only crawl and report the files, bytes and time the pull would take')
+    parser.add_argument('-pl','--plan', dest='plan', metavar='FILE', help='with --pull --dryrun, write the files to pull to FILE; with --pull, download the files in FILE without crawling',default=None)
+    parser.add_argument('-sh','--shard', dest='shard', metavar='i/N', help='with --pull, only download the files that belong to shard i of N, for N machines sharing a file system to pull a product together',default=None)
+    parser.add_argument('-mg','--merge', dest='merge', type=int, metavar='N', help='with --verify, first merge what shards 1/N..N/N recorded and check they downloaded every file between them',default=0)
+    parser.add_argument('-w', '--watch', dest='watch', type=float, metavar='seconds', help='with --pull, keep running and look for new granules every this many seconds',default=0)
+    parser.add_argument('-nw','--newest', dest='newest', type=int, metavar='N', help='with --watch, the newest date directories to look at after the first full pull (default 2)',default=2)
     parser.add_argument('-v', '--verbose', action='store_true', help='list files as well as directories')
     parser.add_argument('-pd', '--description',action='store_true',help='list descriptions of all products available for download')
     args = parser.parse_args()
@@ -443,216 +1222,151 @@ if __name__ == '__main__':
         
     
     # sort out arguments and return errors if need be
-    args.prod = args.prodlist or args.prodpull  
-    try:
-        url = prod_path[args.prod][args.dival['url']]
-    except:
-        exit_msg('Product number %s is not available. Use --description for current list.' % args.prod)    
+    if args.checksum == 'none':
+        args.checksum = None
+    if len([item for item in (args.prodlist,args.prodpull,args.prodverify,args.jobs,args.input) if item]) > 1:
+        exit_msg('You can only list, pull or verify, one at a time.')
+    if args.jobs:
+        try:
+            jobs = readJobs(args.jobs)
+        except ValueError as e:
+            exit_msg(str(e))
+        args.prodpull = [job['product'] for job in jobs]
+    else:
+        jobs = [{'product':prod} for prod in (args.prodpull or [args.prodlist or args.prodverify])]
 
-    if args.region != 'all': 
-        args.region = check_region_name(args.region)
-    
-    if args.region and prod_path[args.prod][args.dival['dateLevel']]<=1:
-        exit_msg('This product, %s, does not have regions.' % args.prod)
-        
-    args.outpath = './' + args.prod
-    
-    # put --firstdate and --lastdate arguments into datetime.date format
-    yf,mf,df = [int(item) for item in args.firstdate.split('-')]
-    firstdate = datetime.date(yf,mf,df)  
-    yl,ml,dl = [int(item) for item in args.lastdate.split('-')]
-    lastdate = datetime.date(yl,ml,dl)      
-    # modify dates if dateFormat dictates
-    datetags = prod_path[args.prod][args.dival['dateFormat']].replace('.','-').split('-')  # a list results
-    year = month = day = False
-    for item in datetags:
-        if item.startswith('y'):
-            year = True
-            if item.endswith('m'): # 0724
-                month = True
-        if item.startswith('m'):
-            month = True
-        if item.startswith('d'):
-            day = True
-    if month and not day:
-        df = 1
-        wkday,dl = calendar.monthrange(yl,ml)
-        firstdate = datetime.date(yf,mf,df)  
-        lastdate = datetime.date(yl,ml,dl)      
-    if not month and not day:
-        mf=1;df=1
-        ml=12;dl=31
-        firstdate = datetime.date(yf,mf,df)  
-        lastdate = datetime.date(yl,ml,dl)      
-    
-    if args.prodlist and args.prodpull:
-        exit_msg('You can only list or pull, not both.')
+    if args.repair and not args.prodverify:
+        exit_msg('--repair goes with --verify.')
+    if (args.dryrun or args.plan) and not args.prodpull:
+        exit_msg('--dryrun and --plan go with --pull.')
+    if args.plan and len(jobs) > 1:
+        exit_msg('--plan is for one product at a time.')
+    if args.shard:
+        if not args.prodpull:
+            exit_msg('--shard goes with --pull, use --verify --merge N to check the shards together.')
+        try:
+            args.shard = parseShard(args.shard)
+        except ValueError as e:
+            exit_msg(str(e))
+    if args.merge and not args.prodverify:
+        exit_msg('--merge goes with --verify.')
+    if args.watch and (not args.prodpull or args.dryrun or args.plan):
+        exit_msg('--watch goes with --pull, without --dryrun or --plan.')
 
-    if prod_path[args.prod][args.dival['dateLevel']] == 0 and args.region:
-        exit_msg('Product {0} does not have directories separated by region or dates.'.format(args.prod))
+    if args.input:
+        products = [input_args(args,args.input)]
+    else:
+        products = [product_args(args,job) for job in jobs]
+    if not args.prodpull:
+        # listing, verifying and orders take one product, the code below uses its args directly
+        args = products[0]
+    url = args.url if not args.prodpull else None
 
-    # ensure a / on the end
-    if args.type:
-        args.type = args.type.strip('/') + '/'
-    if args.byname:
-        args.byname = args.byname.strip('/') + '/'
-        if firstdate == datetime.date(1900,1,1) and lastdate == datetime.date(2100,1,1):
-            firstdate = datetime.date(2100,1,1)   # if by name, dont get by dates
-            lastdate = datetime.date(1900,1,1)
-            
-    if args.prod not in prod_path:
-        exit_msg('Product {0} is not available, please see getgimp.py -h or update ./productPaths.csv'.format(args.prod))
+    # verifying only reads the local tree, no login or network needed unless there is something to repair
+    if args.prodverify:
+        if not os.path.isdir(args.outpath):
+            exit_msg('Nothing downloaded for product {0} in {1}.'.format(args.prod,args.outpath))
+        args.state = downloadState(os.path.join(args.outpath,'.download_state.sqlite'))
+        args.manifest = remote_manifest(os.path.join(args.outpath,'.remote_manifest.json'))
+        bad = merge_shards(url,args,args.merge) if args.merge else {}
+        bad.update(verify_product(url,args))
+        if not bad:
+            sys.exit(0)
+        if not args.repair:
+            exit(-1)
         
-    cookie_maintenance()
+    from cookieMaintenance import cookie_maintenance
+    auth = cookie_maintenance(lazy=True)
+    # segmented downloads open up to args.segments connections per file
+    session = make_session(auth.cookie_jar,max_connections(args))
+    if not args.nocache:
+        listing_cache = listingCache(LISTING_CACHE_PATH,args.listing_ttl,args.offline)
 
-    ##### list or pull files 
-    # dateLevel = 0 currently means no date level, but has types
-    #dir_list = []   
-    if prod_path[args.prod][args.dival['dateLevel']] == 0:
-        files, dirs = get_names(url,args)
-        [print('file: ',file) for file in files if args.prodlist if files if args.verbose] 
-        if args.prodlist and not args.verbose:
-            use_msg('Use --verbose to see file listing for product {0}.'.format(args.prod))
-                
-        if files and args.prodpull:
-            download_prod(url,args,prod_path[args.prod][args.dival['url']])
-            #dir_list.append(url)
-
-        if dirs:
-            for dirname in dirs:    
-                if args.prodlist:
-                    print(dirname)
-                    subfiles, subdirs = get_names(url+dirname,args)
-                    [print('file: ',dirname+file) for file in subfiles if subfiles if args.verbose] 
-                else:
-                    subfiles, subdirs = get_names(url+dirname,args)
-                    if subfiles:
-                        download_prod(url+dirname,args,prod_path[args.prod][args.dival['url']])
-                        #dir_list.append(url+dirname)
-            if not args.type:
-                use_msg('Use --type for mosaic type.')                        
-        if args.prodlist:
-            use_msg('Use --pull instead of --list to pull/download the files.')
-    
-    # dateLevel = 1 indicates there are dirs within that go by date,
-    elif prod_path[args.prod][args.dival['dateLevel']] == 1:     
-        files, dirs = get_names(url,args)
-        [print('file: ',file) for file in files if args.prodlist if files if args.verbose] 
-        if args.prodlist and not args.verbose:
-            use_msg('Use --verbose to see file listing for product {0}.'.format(args.prod))
+    # one limit per server in productPaths.csv, starting at --threads connections
+    host_limits = hostLimits(args.threads,max_connections(args))
+    for key in prod_path:
+        host_limits.limiter(prod_path[key][args.dival['url']])
 
-        if files and args.prodpull:
-            download_prod(url,args,prod_path[args.prod][args.dival['url']])
-            #dir_list.append(url)
+    if args.prodpull or args.prodverify or args.input:
+        for pargs in products:
+            establish_dir(pargs.outpath)
+            # shards keep their own manifest and state database, --verify --merge brings them together
+            pargs.manifest = remote_manifest(os.path.join(pargs.outpath,'.remote_manifest' + shardSuffix(pargs.shard) + '.json'))
+            pargs.state = downloadState(os.path.join(pargs.outpath,'.download_state' + shardSuffix(pargs.shard) + '.sqlite'))
 
-        if dirs:
-            # trim by dates
-            dirs = directory_dates(dirs,args)
-            if args.byname and args.byname not in dirs:
-                dirs.append(args.byname)
+    ##### list or pull files 
+    failed = []
+    if args.prodverify:
+        failed = pull_product(url,args,repair_listings(bad,args))
+    elif args.input:
+        try:
+            failed = pull_product(None,args,order_listings(readOrder(args.input)))
+        except ValueError as e:   # the order could not be read, or stopped making sense part way
+            stop_msg('Stopped reading the order: {0}'.format(e),products)
+    elif args.prodpull:
+        # every product to pull goes through the same workers at once
+        pulls = []
+        for pargs in products:
+            if args.plan and not args.dryrun:
+                pulls.append((pargs.url,pargs,read_plan(args.plan,pargs.url)))
+            elif prod_path[pargs.prod][args.dival['dateLevel']] == 2 and not pargs.region:
+                failed += show_regions(pargs.url,pargs)
+            elif args.dryrun:
+                try:
+                    failed += plan_product(pargs.url,pargs)['unlisted']
+                except ValueError as e:
+                    stop_msg(str(e),products)
+            else:
+                pulls.append((pargs.url,pargs,None))
+        if pulls and args.watch:
+            try:
+                watch_products([pargs for purl, pargs, listings in pulls],args)
+            except KeyboardInterrupt:
+                print('\nStopped watching.')
+                sys.exit(0)
+            except ValueError as e:
+                stop_msg(str(e),products)
+        if pulls:
+            try:
+                failed += pull_products(pulls,args)
+            except ValueError as e:
+                stop_msg(str(e),products)
+            if args.verbose:
+                print('Connections per host: ',host_limits.summary())
+    elif prod_path[args.prod][args.dival['dateLevel']] == 2 and not args.region:
+        show_regions(url,args)
+    else:
+        level = prod_path[args.prod][args.dival['dateLevel']]
+        listed = []
+        typed = False
+        try:
+            for urldir, depth, files, dirs, details in crawl_product(url,args,failed):
+                typed = typed or (level == 0 and depth == 0 and bool(dirs))
+                listed.append((urldir.replace(url,''),files))
+        except ValueError as e:
+            stop_msg(str(e),products)
 
-            for dirname in dirs:    
-                if args.prodlist:
-                    print(dirname)
-                    subfiles, subdirs = get_names(url+dirname,args)
-                    [print('file: ',dirname+file) for file in subfiles if subfiles if args.verbose] 
-                       
-                    if subdirs:
-                        if args.type and args.type in subdirs or not args.type:
-                            for subname in subdirs:
-                                print(dirname+subname)
-                                if args.verbose:
-                                    subsubfiles, subsubdirs = get_names(url+dirname+subname,args)
-                                    [print('file: ',dirname+subname+file) for file in subsubfiles if subsubfiles] 
-                        
-                else:
-                    subfiles, subdirs = get_names(url+dirname,args)
-                    if subfiles:
-                        download_prod(url+dirname,args,prod_path[args.prod][args.dival['url']])
-                        #dir_list.append(url+dirname)
-                    
-                    if subdirs:
-                        if args.type and args.type in subdirs or not args.type:
-                            for subname in subdirs:
-                                subsubfiles, subsubdirs = get_names(url+dirname+subname,args)
-                                if subsubfiles:
-                                    download_prod(url+dirname+subname,args,prod_path[args.prod][args.dival['url']])
-                                    #dir_list.append(url+dirname+subname)
-                                if subsubdirs:
-                                    print('subsubdirs',subsubdirs)    
-                
-            if args.prodlist:                
-                use_msg('Use --pull instead of --list to pull/download files.')
-
-
-    # dateLevel = 2 indicates there are dirs that go by date, one level down
-    elif prod_path[args.prod][args.dival['dateLevel']] == 2:
-        if not args.region:
-            files, dirs = get_names(url,args)
-            [print('file: ',file) for file in files if args.prodlist if files]     
-            if args.prodlist and not args.verbose:
-                use_msg('Use --verbose to see file listing for product {0}.'.format(args.prod))
-                
-            if files and args.prodpull:
-                download_prod(url,args,prod_path[args.prod][args.dival['url']])
-                #dir_list.append(url)
-            
-            if dirs:
-                for dirname in dirs:
-                    print(dirname)
-                use_msg('Use --region REGION or --region all to list or download files for product {0}.'.format(args.prod))
-
-                            
-        elif args.region:
-            files, dirs = get_names(url,args)
-            [print('file: ',file) for file in files if args.prodlist if files if args.verbose] 
-            if files and args.prodpull:
-                download_prod(url,args,prod_path[args.prod][args.dival['url']])
-                        
-            if dirs:
-                for dirname in dirs:
-                    if args.prodlist:
-                        subfiles, subdirs = get_names(url + dirname,args)
-                        [print('file: ',dirname+file) for file in subfiles if subfiles if args.verbose]
-
-                        if subdirs:
-                            # trim by date
-                            subdirs = directory_dates(subdirs,args)
-                            if args.byname:
-                                subdirs.append(args.byname)                       
-                            [print(dirname+subname) for subname in subdirs if subdirs if not args.verbose]
-                        
-                            if args.verbose:
-                                for subname in subdirs:
-                                    subsubfiles, subsubdir = get_names(url + dirname + subname,args)
-                                    [print('file: ',dirname+subname+file) for file in subsubfiles if subsubfiles] 
-                                
-                    else:
-                        subfiles, subdirs = get_names(url + dirname,args)                        
-                        if subfiles:
-                            download_prod(url+dirname,args,prod_path[args.prod][args.dival['url']])
-                            #dir_list.append(url+dirname)
-                                
-                        if subdirs:
-                            # trim by date
-                            subdirs = directory_dates(subdirs,args)
-                            if args.byname:
-                                subdirs.append(args.byname)
-                       
-                            for subname in subdirs:
-                                subsubfiles, subsubdirs = get_names(url + dirname + subname,args)
-                                if subsubfiles:
-                                    download_prod(url+dirname+subname,args,prod_path[args.prod][args.dival['url']])
-                                    #dir_list.append(url+dirname+subname)
-                                    
-                                if subsubdirs:
-                                    print('huh ', subsubdirs)
-                                    exit(-1)
-            if args.prodlist and not args.verbose:
-                use_msg('Use --verbose to list files.')
-            if args.prodlist:
-                use_msg('Use --pull instead of --list to pull/download files.')
-                
-        if args.prodpull:
-            print('Done')
-        
\ No newline at end of file
+        # directories come in the order they were listed, print them as a tree
+        for local_dirname, files in sorted(listed):
+            if local_dirname:
+                print(local_dirname)
+            [print('file: ',local_dirname+file) for file in files if args.verbose]
+        if not args.verbose:
+            use_msg('Use --verbose to see file listing for product {0}.'.format(args.prod))
+        if typed and not args.type:
+            use_msg('Use --type for mosaic type.')
+        use_msg('Use --pull instead of --list to pull/download files.')
+
+    if args.prodpull or args.prodverify or args.input:
+        for pargs in products:
+            pargs.manifest.save()
+    for pargs in products:
+        if pargs.regions is not None:
+            pargs.regions.save()
+    if failed:
+        print('\n{0} files or directories could not be downloaded or listed, run the same command again to resume them:'.format(len(failed)))
+        for inf in sorted(failed):
+            print('\t',inf)
+        exit(-1)
+    if (args.prodpull and not args.dryrun) or args.prodverify or args.input:
+        print('Done')
@@ -1,104 +1,203 @@
 #!/usr/bin/python3
 #
 # This program runs in a directory of EOF orbit files from ESA. It checks the last file downloaded, and then proceeds to
-# download all new files to present
+# download all new files to present.
+# The dated directories are listed in parallel, what is already here is kept in a local index (.orbitIndex.json)
+# instead of asking ls, and the downloads are streamed several at a time through one pooled session.
+# Files of every platform (S1A, S1B, S1C ...) are picked up, the platform is read from the file name. Each
+# platform carries on from its own last file; one that stopped (S1B) is left out unless asked for.
 #
-import utilities as u
+import os
+import re
+import json
+import argparse
+import threading
 from datetime import datetime,timedelta
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from html.parser import HTMLParser
-import copy
-import urllib
+import requests
+#
+# where the precise orbits are, one directory per publication date: POEORB/yyyy/mm/dd/
+defaultURL='http://aux.sentinel1.eo.esa.int/POEORB/'
+indexFile='.orbitIndex.json'
+# a platform whose last file is this many days behind the newest one here is taken as retired
+retiredDays=30
+#
+# S1A_OPER_AUX_POEORB_OPOD_20150301T122513_V20150208T225944_20150210T005944.EOF
+#   platform  ... publication date (the directory it is in) ... validity
+orbitName=re.compile(r'^(S1[A-Z])_OPER_AUX_\w+?_OPOD_(\d{8})T\d{6}_V\d{8}T\d{6}_\d{8}T\d{6}\.EOF$')
 #
 # subclass my parser to grab data
 class myHTMLParser(HTMLParser) :
-    # store my data here
-    S1A=''
-    S1B=''
-    # redefine handle_date
+    # orbit file names found in the page, for all platforms
+    def __init__(self) :
+        HTMLParser.__init__(self)
+        self.files=[]
+    # redefine handle_data
     def handle_data(self,data) :
-        if 'EOF' in data :
-            if 'S1A' in data :
-                self.S1A=data
-            elif 'S1B' in data :
-                self.S1B=data
-            else :
-                u.myerror('invalid orbit file')
+        data=data.strip()
+        if orbitName.match(data) and data not in self.files :
+            self.files.append(data)
 #
 # parse returned HTML to get file names
 def parseFileNames(myText) :
     myParser=myHTMLParser()
     myParser.feed(myText)
-    return myParser.S1A,myParser.S1B
+    return myParser.files
 #
-# get the last orbit downloaded to determine starting point
-def getLastOrbDate() :
-    #
-    # dir to get last name
-    S1A=u.dols('ls S1A_OPER*.EOF')[-1]
-    S1B=u.dols('ls S1B_OPER*.EOF')[-1]
-    # get the dates
-    dirDateA=   datetime.strptime(S1A.split('_')[5].split('T')[0],"%Y%m%d")
-    dirDateB=   datetime.strptime(S1B.split('_')[5].split('T')[0],"%Y%m%d")    
-    return dirDateA,dirDateB
+# platform and publication date of an orbit file, None if the name is not one
+def orbitInfo(fileName) :
+    m=orbitName.match(fileName)
+    if m is None :
+        return None
+    return m.group(1),datetime.strptime(m.group(2),'%Y%m%d')
+#
+# the local index: {file name: size} of the orbit files here. It is what says what we have; the directory is
+# only scanned to build it on the first run, or with rescan after files were added or removed by hand
+def readIndex(rescan=False) :
+    if not rescan :
+        try :
+            with open(indexFile) as f :
+                return json.load(f)
+        except (IOError,ValueError) :
+            pass
+    return {entry.name:entry.stat().st_size for entry in os.scandir('.') if entry.is_file() and orbitInfo(entry.name)}
 
-def getFilePaths(dirDate) :
-    myPaths=[]
-    # get today to know when to stop
+def saveIndex(index) :
+    with open(indexFile+'.tmp','w') as f :
+        json.dump(index,f,indent=1,sort_keys=True)
+    os.replace(indexFile+'.tmp',indexFile)
+#
+# get the last orbit downloaded, per platform, to determine starting point
+def getLastOrbDate(index) :
+    lastDates={}
+    for name in index :
+        platform,pubDate=orbitInfo(name)
+        lastDates[platform]=max(pubDate,lastDates.get(platform,pubDate))
+    return lastDates
+#
+# the platforms still publishing: those whose last file is within retiredDays of the newest one here
+def activePlatforms(lastDates) :
+    if not lastDates :
+        return {}
+    newest=max(lastDates.values())
+    return {platform:date for platform,date in lastDates.items() if (newest-date).days <= retiredDays}
+#
+# one pooled session for all the threads, so connections are reused
+def makeSession(nThreads) :
+    session=requests.Session()
+    adapter=requests.adapters.HTTPAdapter(pool_connections=nThreads,pool_maxsize=nThreads)
+    session.mount('http://',adapter)
+    session.mount('https://',adapter)
+    return session
+#
+# list the dated directories from dirDate to today, at most nThreads at a time, and return the paths of the orbit
+# files of the wanted platforms (all when platforms is None) that are not in the index, and the days that could
+# not be listed. -- starts -- has the first date of each platform, whose files from before it are not looked
+# at; others start at dirDate
+def getFilePaths(session,url,dirDate,index,platforms=None,nThreads=8,starts=None) :
     today=datetime.now()
-    # first data to process
-    workingDate=dirDate+timedelta(1)
+    dates=[dirDate+timedelta(n) for n in range((today-dirDate).days+1)]
+    starts=starts or {}
     #
-    # loop until done
+    def wanted(name) :
+        platform,pubDate=orbitInfo(name)
+        return name not in index and (platforms is None or platform in platforms) and pubDate >= starts.get(platform,dirDate)
     #
-    #count=0
-    while 1 :
-        #
+    def listDay(workingDate) :
         # server path to the dated directory
-        myPath='http://aux.sentinel1.eo.esa.int/POEORB/'+workingDate.strftime('%Y/%m/%d/')
-        # grab the contents
-        res=requests.get( myPath)
-        # parse out the names
-        S1A,S1B=parseFileNames(res.text)
-        # append names to paths
-        if len(S1A) > 1 :
-            S1Apath=myPath+S1A
-            myPaths.append(S1Apath)
-        if len(S1B) > 1 :
-            S1Bpath=myPath+S1B
-            myPaths.append(S1Bpath)
-        # advance to next date
-        workingDate += timedelta(1)
-        # exit if past present
-        if workingDate > today :
-            break
-       # count+=1
-        #if(count > 60) :
-          #  break
-    return myPaths
-
-def downloadOrbFiles(orbPaths) :
-    for orbPath in orbPaths :
-        print('Downloading : ',orbPath)
-        # save to local directory with same filename
+        myPath=url+workingDate.strftime('%Y/%m/%d/')
+        try :
+            res=session.get(myPath,timeout=60)
+            if res.status_code == 404 :   # nothing published that day (yet)
+                return []
+            res.raise_for_status()
+        except requests.exceptions.RequestException as e :
+            print('Failed : ',myPath,e)
+            return None
+        return [myPath+name for name in parseFileNames(res.text) if wanted(name)]
+    #
+    myPaths=[]
+    failedDays=[]
+    with ThreadPoolExecutor(max_workers=nThreads) as pool :
+        for workingDate,paths in zip(dates,pool.map(listDay,dates)) :
+            if paths is None :
+                failedDays.append(workingDate)
+            else :
+                myPaths+=paths
+    return myPaths,failedDays
+#
+# stream the files to the local directory with the same filenames, nThreads at a time. Each file goes to name.part
+# first and is renamed once complete, so an interrupted run never leaves a partial .EOF behind
+def downloadOrbFiles(session,orbPaths,index,nThreads=8) :
+    lock=threading.Lock()
+    #
+    def downloadOne(orbPath) :
         fileName=orbPath.split('/')[-1]
-        urllib.request.urlretrieve(orbPath,fileName)
-        
+        try :
+            with session.get(orbPath,stream=True,timeout=60) as res :
+                res.raise_for_status()
+                with open(fileName+'.part','wb') as f :
+                    for chunk in res.iter_content(chunk_size=1024*1024) :
+                        f.write(chunk)
+            os.replace(fileName+'.part',fileName)
+        except (requests.exceptions.RequestException,IOError) as e :
+            print('Failed : ',orbPath,e)
+            return False
+        with lock :
+            index[fileName]=os.path.getsize(fileName)
+        print('Downloaded : ',fileName)
+        return True
+    #
+    with ThreadPoolExecutor(max_workers=nThreads) as pool :
+        results=list(pool.map(downloadOne,orbPaths))
+    return results.count(False)
+
 def main() :
-    # check what has been downloaded and start from there
-    dirDateA,dirDateB=getLastOrbDate()
-    #-----    
-    #dirDateA= datetime.strptime("20150301","%Y%m%d")
-    # both should be the same, but in case not go with earliest
-    bestDate=min(dirDateA,dirDateB)
-    print('Downloading all data after ', bestDate)
+    parser=argparse.ArgumentParser(description='Download the Sentinel-1 precise orbit files published since the last one here.')
+    parser.add_argument('--url',default=defaultURL,help='orbit directory tree (default %s)' % defaultURL)
+    parser.add_argument('--platforms',default=None,help='comma separated platforms to get, e.g. S1A,S1B (default all)')
+    parser.add_argument('--start',default=None,help='first publication date as yyyy-mm-dd, instead of the last one here')
+    parser.add_argument('--rescan',action='store_true',help='rebuild %s from the files here' % indexFile)
+    parser.add_argument('--threads',type=int,default=8,help='directories listed and files downloaded at once (default 8)')
+    args=parser.parse_args()
+    platforms=set(args.platforms.split(',')) if args.platforms else None
     #
-    orbPaths=getFilePaths(bestDate)
-    #-----
-    #print(orbPaths)
-    #orbPaths=orbPaths[0:59]
+    # check what has been downloaded and start from there
+    index=readIndex(args.rescan)
+    lastDates=getLastOrbDate(index)
+    if platforms is not None :
+        lastDates={platform:date for platform,date in lastDates.items() if platform in platforms}
+    else :
+        lastDates=activePlatforms(lastDates)
+    if args.start :
+        bestDate=datetime.strptime(args.start,'%Y-%m-%d')
+        lastDates={}
+    elif lastDates :
+        # each platform carries on from its own last day, listing starts at the earliest of them. The last day is
+        # listed again since more files may have been published that day after the last run; the index skips
+        # the ones here. Files of platforms not seen here yet (a new S1x) are taken from bestDate on.
+        bestDate=min(lastDates.values())
+    else :
+        print('No orbit files here yet, use --start yyyy-mm-dd to say where to begin.')
+        return 1
+    print('Downloading all data from ', bestDate.strftime('%Y-%m-%d'))
     #
-    downloadOrbFiles(orbPaths)
+    session=makeSession(args.threads)
+    orbPaths,failedDays=getFilePaths(session,args.url,bestDate,index,platforms,args.threads,lastDates)
+    print('{0} new orbit files'.format(len(orbPaths)))
+    try :
+        nFailed=downloadOrbFiles(session,orbPaths,index,args.threads)
+    finally :
+        saveIndex(index)
+    if failedDays :
+        # later files are here now, a plain run would start after these days: they need --start
+        print('{0} days could not be listed: {1}'.format(len(failedDays),' '.join(day.strftime('%Y-%m-%d') for day in failedDays)))
+        print('Run again with --start {0} to get their files.'.format(failedDays[0].strftime('%Y-%m-%d')))
+    if nFailed :
+        print('{0} files failed, run again to get them.'.format(nFailed))
+    return 1 if failedDays or nFailed else 0
 
 
-main()
+if __name__ == '__main__' :
+    exit(main())
@@ -0,0 +1,48 @@
+# Python 3.7+ (-X importtime)
+from __future__ import print_function
+import os
+import sys
+import subprocess
+
+# modules getgimp.py loads only once it has to crawl, download or log in
+heavyModules=('requests','urllib3','aiohttp','asyncio','bs4','ssl','urllib.request','http.cookiejar','concurrent.futures.process')
+# milliseconds importing getgimp may take
+DEFAULT_BUDGET=60.
+here=os.path.dirname(os.path.abspath(__file__))
+
+
+def importTimes(command) :
+    """ {module: cumulative import time in ms} of running python -X importtime -- command -- in this directory."""
+    p=subprocess.Popen([sys.executable,'-X','importtime']+command,cwd=here,
+                       stdout=subprocess.DEVNULL,stderr=subprocess.PIPE,universal_newlines=True)
+    err=p.communicate()[1]
+    times={}
+    for line in err.splitlines() :
+        fields=line.split('|')
+        if line.startswith('import time:') and len(fields) == 3 and fields[1].strip().isdigit() :
+            times[fields[2].strip()]=int(fields[1])/1000.
+    return times
+
+
+def checkImports(budget=DEFAULT_BUDGET,repeat=5) :
+    """ check that importing getgimp stays within -- budget -- ms (best of -- repeat --) and that -h and -pd
+ do not load any of heavyModules. Returns the problems found."""
+    problems=[]
+    best=min(importTimes(['-c','import getgimp']).get('getgimp',float('inf')) for n in range(repeat))
+    print('import getgimp {0:8.1f} ms  (budget {1:.0f} ms)'.format(best,budget))
+    if best > budget :
+        problems.append('importing getgimp took {0:.1f} ms, more than {1:.0f} ms'.format(best,budget))
+    for option in ('-h','-pd') :
+        loaded=sorted(set(heavyModules) & set(importTimes(['getgimp.py',option])))
+        print('getgimp.py {0:4s} loads {1}'.format(option,', '.join(loaded) or 'none of '+', '.join(heavyModules)))
+        if loaded :
+            problems.append('getgimp.py {0} loads {1}'.format(option,', '.join(loaded)))
+    return problems
+
+
+if __name__ == '__main__' :
+    # python importBudget.py [budget_ms] ; exits 1 when getgimp.py got slower to start
+    problems=checkImports(float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET)
+    for problem in problems :
+        print(problem)
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,112 @@
+# Python 2 and 3:
+from __future__ import print_function
+import re
+import sys
+import time
+try:
+    from html import unescape
+except ImportError:   # Python 2
+    from HTMLParser import HTMLParser
+    unescape = HTMLParser().unescape
+
+# Apache FancyIndexing (HTMLTable) pages are machine written, one <tr> per entry:
+#   <tr class="odd"><td class="indexcolicon"><a href="x.tif"><img src="/icons/image2.gif" alt="[IMG]"></a></td>
+#   <td class="indexcolname"><a href="x.tif">x.tif</a></td><td class="indexcollastmod">2018-10-03 15:21  </td>
+#   <td class="indexcolsize">7.3M</td></tr>
+# so rather than building a document tree the page is scanned row by row with a few precompiled patterns.
+_table=re.compile(r'<table\b[^>]*\bid\s*=\s*["\']?indexlist\b[^>]*>(.*?)(?:</table>|$)',re.S|re.I)
+_row=re.compile(r'<tr\b[^>]*\bclass\s*=\s*["\']?(?:[^"\'>]*\s)?(?:even|odd)\b[^>]*>(.*?)(?=<tr\b|</table>|$)',re.S|re.I)
+_cell=re.compile(r'<td\b[^>]*\bclass\s*=\s*["\']?(indexcol\w+)[^>]*>(.*?)(?=<td\b|</tr>|$)',re.S|re.I)
+_href=re.compile(r'<a\b[^>]*\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))',re.I)
+_alt=re.compile(r'<img\b[^>]*\balt\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))',re.I)
+_tag=re.compile(r'<[^>]*>')
+
+
+def _text(cell) :
+    return unescape(_tag.sub('',cell)).strip()
+
+
+def parseIndex(html) :
+    """ File names, directory names and per file details {'size','last_modified'} (as printed in the listing)
+ from the table id="indexlist" of an Apache index page -- html --. Directory names end in '/'; the
+ parent directory row is left out."""
+    alist=[]
+    details={}
+    for table in _table.finditer(html) :
+        for row in _row.finditer(table.group(1)) :
+            cells={}
+            for cell in _cell.finditer(row.group(1)) :
+                cells.setdefault(cell.group(1).lower(),cell.group(2))
+            icon=cells.get('indexcolicon')
+            if icon is None :
+                continue
+            alt=_alt.search(icon)
+            if alt is None or 'parent' in ''.join(a for a in alt.groups() if a).lower() :
+                continue
+            for a in _href.finditer(icon) :
+                href=unescape(next(h for h in a.groups() if h is not None))
+                alist.append(href)
+                details[href]={'size':_text(cells.get('indexcolsize','')),
+                               'last_modified':_text(cells.get('indexcollastmod',''))}
+    flist=[item for item in alist if not item.endswith('/')]
+    dlist=[item for item in alist if item.endswith('/')]
+    return flist,dlist,{item:details[item] for item in flist}
+
+
+def parseIndexSoup(html) :
+    """ The BeautifulSoup implementation parseIndex replaced, kept as the reference for the benchmark."""
+    from bs4 import BeautifulSoup
+    alist=[]
+    details={}
+    soup=BeautifulSoup(html,'html.parser')
+    for table in soup.find_all('table',{'id':'indexlist'}) :
+        for tr in table.find_all('tr',{'class':['even','odd']}) :
+            for td in tr.find_all('td',{'class':'indexcolicon'}) :
+                if 'parent' not in td.img['alt'].lower() :
+                    for a in td.find_all('a') :
+                        alist.append(a['href'])
+                        size=tr.find('td',{'class':'indexcolsize'})
+                        lastmod=tr.find('td',{'class':'indexcollastmod'})
+                        details[a['href']]={'size':size.get_text().strip() if size else '',
+                                            'last_modified':lastmod.get_text().strip() if lastmod else ''}
+    flist=[item for item in alist if not item.endswith('/')]
+    dlist=[item for item in alist if item.endswith('/')]
+    return flist,dlist,{item:details[item] for item in flist}
+
+
+def sampleIndex(nFiles,nDirs=20) :
+    """ an Apache index page with -- nDirs -- directories and -- nFiles -- files, for benchmarking."""
+    rows=['<tr><th class="indexcolicon"><img src="/icons/blank.gif" alt="[ICO]"></th><th class="indexcolname"><a href="?C=N;O=D">Name</a></th></tr>',
+          '<tr class="indexbreakrow"><th colspan="5"><hr></th></tr>',
+          '<tr class="even"><td class="indexcolicon"><a href="/pub/DATASETS/"><img src="/icons/back.gif" alt="[PARENTDIR]"></a></td><td class="indexcolname"><a href="/pub/DATASETS/">Parent Directory</a></td><td class="indexcollastmod">&nbsp;</td><td class="indexcolsize">  - </td></tr>']
+    for n in range(nDirs+nFiles) :
+        name='Wcoast-%05.2fN/' % (60+n*0.01) if n < nDirs else 'TSX_W69.10N_%06d_vv.tif' % n
+        alt='[DIR]' if n < nDirs else '[IMG]'
+        size='  - ' if n < nDirs else '%.1fM' % (n % 97)
+        rows.append('<tr class="%s"><td class="indexcolicon"><a href="%s"><img src="/icons/image2.gif" alt="%s"></a></td>'
+                    '<td class="indexcolname"><a href="%s">%s</a></td><td class="indexcollastmod">2019-03-%02d 12:%02d  </td>'
+                    '<td class="indexcolsize">%s</td><td class="indexcoldesc">&nbsp;</td></tr>'
+                    % ('odd' if n % 2 else 'even',name,alt,name,name,1+n % 28,n % 60,size))
+    return '<html><body><h1>Index of /x</h1><table id="indexlist">\n'+'\n'.join(rows)+'\n<tr class="indexbreakrow"><th colspan="5"><hr></th></tr>\n</table></body></html>'
+
+
+def benchmark(html,repeat=5) :
+    """ time parseIndex against parseIndexSoup on -- html --, after checking they agree."""
+    if parseIndex(html) != parseIndexSoup(html) :
+        print('parseIndex and parseIndexSoup disagree!')
+        return
+    for name,parse in (('BeautifulSoup html.parser',parseIndexSoup),('parseIndex',parseIndex)) :
+        best=float('inf')
+        for n in range(repeat) :
+            start=time.time()
+            parse(html)
+            best=min(best,time.time()-start)
+        print('{0:28s} {1:9.2f} ms'.format(name,best*1000))
+
+
+if __name__ == '__main__' :
+    # python indexParser.py [saved_listing.html ...]
+    pages=[open(f).read() for f in sys.argv[1:]] or [sampleIndex(n) for n in (100,1000,10000)]
+    for html in pages :
+        print('{0} entries'.format(len(parseIndex(html)[0])+len(parseIndex(html)[1])))
+        benchmark(html)
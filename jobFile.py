@@ -0,0 +1,67 @@
+# Python 2 and 3:
+from __future__ import print_function
+import os
+
+# what a job may set for its product; everything else comes from the command line
+jobKeys=('product','region','firstdate','lastdate','type','byname','bbox','point','outpath')
+
+
+def _loadToml(path) :
+    try :
+        import tomllib                      # Python 3.11+
+    except ImportError :
+        try :
+            import tomli as tomllib
+        except ImportError :
+            raise ValueError('reading {0} needs Python 3.11 or the tomli package (pip install tomli)'.format(path))
+    with open(path,'rb') as f :
+        return tomllib.load(f)
+
+
+def _loadYaml(path) :
+    try :
+        import yaml
+    except ImportError :
+        raise ValueError('reading {0} needs the PyYAML package (pip install pyyaml)'.format(path))
+    with open(path) as f :
+        return yaml.safe_load(f)
+
+
+def readJobs(path) :
+    """ the products to pull from the job file at -- path --, TOML (.toml) or YAML (.yaml, .yml), as a list
+ of dicts with 'product' (in quotes) and any of jobKeys. The file holds a list of jobs under 'job' (or 'jobs'), e.g.
+        [[job]]
+        product = "0731"
+        firstdate = "2015-01-01"
+        [[job]]
+        product = "0481"
+        region = "all"
+        outpath = "/data/gimp/0481"
+ Raises ValueError when the file can not be read or a job is not understood."""
+    extension=os.path.splitext(path)[1].lower()
+    if extension == '.toml' :
+        loader=_loadToml
+    elif extension in ('.yaml','.yml') :
+        loader=_loadYaml
+    else :
+        raise ValueError('job file {0} should end in .toml, .yaml or .yml'.format(path))
+    try :
+        content=loader(path) or {}
+    except ValueError :
+        raise
+    except Exception as e :   # IOError and the parsers' own errors
+        raise ValueError('can not read job file {0}: {1}'.format(path,e))
+    jobs=content.get('job',content.get('jobs')) if isinstance(content,dict) else content
+    if not isinstance(jobs,list) or not jobs :
+        raise ValueError('job file {0} has no list of jobs under "job"'.format(path))
+    for n,job in enumerate(jobs) :
+        if not isinstance(job,dict) or 'product' not in job :
+            raise ValueError('job {0} in {1} does not name a product'.format(n+1,path))
+        if not isinstance(job['product'],str) :   # unquoted 0731 reads as 731 in TOML, and as octal in YAML
+            raise ValueError('job {0} in {1}: put the product number in quotes, "{2}"'.format(n+1,path,job['product']))
+        unknown=[key for key in job if key not in jobKeys]
+        if unknown :
+            raise ValueError('job {0} in {1}: unknown {2}, a job can set {3}'.format(n+1,path,', '.join(unknown),', '.join(jobKeys)))
+        for key in job :
+            job[key]=str(job[key])   # unquoted TOML and YAML dates come back as dates
+    return jobs
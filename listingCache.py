@@ -0,0 +1,73 @@
+# Python 3 only
+from __future__ import print_function
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+class listingCache :
+    """ Parsed directory listings kept on disk, one JSON file per url under -- path --, along with the
+ ETag and Last-Modified the server sent. A listing younger than -- ttl -- seconds is used as is; an older
+ one is revalidated with If-None-Match/If-Modified-Since, so an unchanged directory costs a 304 and no
+ parsing. With -- offline -- the network is never asked and directories not in the cache come back empty.
+ Use as
+        listing,headers=cache.lookup(url)
+        if listing is None :
+            r=session.get(url,headers=headers)
+            listing=cache.revalidated(url) if r.status_code == 304 else cache.store(url,r.headers,parse(r.text))"""
+
+    def __init__(self,path,ttl=0,offline=False) :
+        self.path=path
+        self.ttl=ttl
+        self.offline=offline
+        if not os.path.exists(self.path) :
+            os.makedirs(self.path)
+
+    def _file(self,url) :
+        return os.path.join(self.path,hashlib.sha1(url.encode('utf-8')).hexdigest()+'.json')
+
+    def _read(self,url) :
+        try :
+            with open(self._file(url)) as f :
+                entry=json.load(f)
+            return entry if entry.get('url') == url else None
+        except (IOError,ValueError) :
+            return None
+
+    def _write(self,entry) :
+        fname=self._file(entry['url'])
+        tmp=fname+'.%d.tmp' % threading.current_thread().ident
+        with open(tmp,'w') as f :
+            json.dump(entry,f)
+        os.replace(tmp,fname)
+
+    def lookup(self,url) :
+        """ (listing, None) when the cached listing can be used without asking the server, otherwise
+ (None, headers) with the conditional request headers to fetch it with."""
+        entry=self._read(url)
+        if entry is not None and (self.offline or time.time() - entry['fetched'] < self.ttl) :
+            return entry['listing'],None
+        if self.offline :
+            print('\n {0} is not in the listing cache, skipped while offline.'.format(url))
+            return ([],[],{}),None
+        headers={}
+        if entry is not None :
+            if entry.get('etag') :
+                headers['If-None-Match']=entry['etag']
+            if entry.get('last_modified') :
+                headers['If-Modified-Since']=entry['last_modified']
+        return None,headers
+
+    def revalidated(self,url) :
+        """ the server answered 304 Not Modified: restart the ttl and return the cached listing."""
+        entry=self._read(url)
+        entry['fetched']=time.time()
+        self._write(entry)
+        return entry['listing']
+
+    def store(self,url,headers,listing) :
+        self._write({'url':url,'fetched':time.time(),'etag':headers.get('ETag'),
+                     'last_modified':headers.get('Last-Modified'),'listing':listing})
+        return listing
@@ -0,0 +1,153 @@
+# Python 3 only
+from __future__ import print_function
+import os
+import re
+import csv
+import xml.etree.ElementTree as ET
+from checksums import algorithmNames, formatChecksum
+from urllib.parse import urlparse
+
+# an http(s) url, as it starts a CSV cell or makes up a line of a url list
+_url=re.compile(r'https?://[^\s\'"<>]+')
+# CSV columns, by lower case header: the url (Vertex and ASF 'URL', Earthdata Search 'Online Access URLs'),
+# an exact size in bytes and an md5, when the order has them
+_urlColumns=('url','download url','granule url','online access urls','online access url')
+_bytesColumns=('bytes','size (bytes)','file size (bytes)')
+_md5Columns=('md5','md5sum','md5 checksum')
+# which checksum of a metalink file to keep when it publishes several
+_hashOrder=('md5','sha256','sha512','sha1')
+
+
+def _local(tag) :
+    return tag.rsplit('}',1)[-1].lower()
+
+
+def _hashRank(checksum) :
+    algorithm=checksum.split(':',1)[0]
+    return _hashOrder.index(algorithm) if algorithm in _hashOrder else len(_hashOrder)
+
+
+def readMetalink(path) :
+    """ the files of the metalink (version 3, as ASF writes them, or 4) at -- path --, as they are parsed:
+ ET.iterparse reads the file in blocks and every <file> element is dropped once it has been handed out,
+ so the whole order never sits in memory."""
+    # the open elements, so a <file> can be taken off its parent (<files> in v3, <metalink> in v4)
+    parents=[]
+    with open(path,'rb') as f :
+        try :
+            for event,element in ET.iterparse(f,events=('start','end')) :
+                if event == 'start' :
+                    parents.append(element)
+                    continue
+                parents.pop()
+                if _local(element.tag) != 'file' :
+                    continue
+                urls=[]
+                hashes=[]
+                entry={}
+                for child in element.iter() :
+                    tag=_local(child.tag)
+                    text=(child.text or '').strip()
+                    if tag == 'url' and text.startswith(('http://','https://')) :
+                        # v4 ranks mirrors by priority (1 first), v3 by preference (100 first)
+                        rank=int(child.get('priority',0) or 0) or -int(child.get('preference',0) or 0)
+                        urls.append((rank,len(urls),text))
+                    elif tag == 'size' and text.isdigit() :
+                        entry['size']=int(text)
+                    elif tag == 'hash' and text and (child.get('type') or '').lower() in algorithmNames :
+                        hashes.append(formatChecksum(child.get('type'),text))
+                if hashes :
+                    # md5 first, the downloads compute it by default and need no second pass over the file
+                    entry['checksum']=min(hashes,key=_hashRank)
+                element.clear()
+                if parents :
+                    parents[-1].remove(element)
+                if urls :
+                    entry['url']=min(urls)[2]
+                    yield entry
+        except ET.ParseError as e :
+            raise ValueError('metalink {0} is not valid XML: {1}'.format(path,e))
+
+
+def readCsv(path) :
+    """ the files of the CSV order at -- path --, one per row as they are read. The url is taken from a
+ column headed URL (see _urlColumns), or from the first column that holds one when there is no header."""
+    with open(path,newline='') as f :
+        rows=csv.reader(f)
+        try :
+            header=[cell.strip().lower() for cell in next(rows)]
+        except StopIteration :
+            return
+        except csv.Error as e :
+            raise ValueError('can not read CSV {0}: {1}'.format(path,e))
+        def column(names) :
+            return next((header.index(name) for name in names if name in header),None)
+        urlColumn=column(_urlColumns)
+        bytesColumn=column(_bytesColumns)
+        md5Column=column(_md5Columns)
+        if urlColumn is None :
+            # no header, the first row is an order line already
+            urlColumn=next((n for n,cell in enumerate(header) if _url.match(cell)),None)
+            if urlColumn is None :
+                raise ValueError('CSV {0} has no URL column'.format(path))
+            f.seek(0)
+            rows=csv.reader(f)
+        try :
+            for row in rows :
+                if len(row) <= urlColumn :
+                    continue
+                url=_url.match(row[urlColumn].strip())
+                if url is None :
+                    continue
+                entry={'url':url.group(0)}
+                if bytesColumn is not None and bytesColumn < len(row) and row[bytesColumn].strip().isdigit() :
+                    entry['size']=int(row[bytesColumn])
+                if md5Column is not None and md5Column < len(row) and re.match(r'^[0-9a-fA-F]{32}$',row[md5Column].strip()) :
+                    entry['checksum']=formatChecksum('md5',row[md5Column].strip())
+                yield entry
+        except csv.Error as e :
+            raise ValueError('can not read CSV {0}, line {1}: {2}'.format(path,rows.line_num,e))
+
+
+def fileUrl(url) :
+    """ whether -- url -- is http(s) and names a file: a path that does not end in /."""
+    parts=urlparse(url)
+    return parts.scheme in ('http','https') and bool(parts.netloc) and bool(parts.path.rsplit('/',1)[-1])
+
+
+def readUrlList(path) :
+    """ the files of a plain list of urls at -- path --, one url of a file per line; blank lines and lines
+ starting with # are skipped. Any other line (a directory url, a command, text) raises ValueError, so a
+ file that is not a url list is not taken for one."""
+    with open(path) as f :
+        for n,line in enumerate(f) :
+            line=line.strip()
+            if not line or line.startswith('#') :
+                continue
+            url=_url.match(line)
+            if url is None or url.group(0) != line or not fileUrl(line) :
+                raise ValueError('line {0} of {1} is not the url of a file: {2}'.format(n+1,path,line[:80]))
+            yield {'url':line}
+
+
+def readOrder(path) :
+    """ the files to download from an order file at -- path -- (a metalink, .metalink or .meta4; a CSV; or
+ anything else as a url list), as {'url', and when the order says 'size' in bytes and 'checksum' as
+ 'algorithm:hexdigest'} dicts yielded as the file is read, so downloads start before it has been parsed
+ to the end. Raises ValueError when the file can not be read."""
+    if not os.path.isfile(path) :
+        raise ValueError('there is no order file {0}'.format(path))
+    extension=os.path.splitext(path)[1].lower()
+    if extension in ('.metalink','.meta4') :
+        reader=readMetalink
+    elif extension == '.csv' :
+        reader=readCsv
+    else :
+        with open(path,'rb') as f :
+            start=f.read(512).lstrip()
+        reader=readMetalink if start.startswith(b'<') else readUrlList
+    try :
+        for entry in reader(path) :
+            yield entry
+    except (IOError,UnicodeDecodeError) as e :
+        raise ValueError('can not read order file {0}: {1}'.format(path,e))
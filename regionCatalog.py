@@ -0,0 +1,155 @@
+# Python 3 only
+from __future__ import print_function
+import os
+import re
+import json
+import bisect
+import threading
+import xml.etree.ElementTree as ET
+
+# Wcoast-69.10N, Jakobshavn-69.2N-49.8W: latitude and, when the name has one, longitude
+_latitude=re.compile(r'(\d+(?:\.\d+)?)\s*([NS])(?![A-Za-z])')
+_longitude=re.compile(r'(\d+(?:\.\d+)?)\s*([EW])(?![A-Za-z])')
+
+
+def nameLocation(name) :
+    """ (latitude, longitude) written in a region directory -- name --, either None when it has none."""
+    lat=_latitude.search(name)
+    lon=_longitude.search(name)
+    return (float(lat.group(1))*(1 if lat.group(2) == 'N' else -1) if lat else None,
+            float(lon.group(1))*(1 if lon.group(2) == 'E' else -1) if lon else None)
+
+
+def _local(tag) :
+    return tag.rsplit('}',1)[-1].lower()
+
+
+def metadataBounds(xmlPath) :
+    """ (west, south, east, north) covered by the granule metadata file -- xmlPath --, from its bounding
+ rectangles (West/South/East/NorthBoundingCoordinate) or else its polygon points (PointLongitude,
+ PointLatitude). None when it has neither or can not be read."""
+    try :
+        root=ET.parse(xmlPath).getroot()
+    except (ET.ParseError,IOError,OSError) :
+        return None
+    values={}
+    for element in root.iter() :
+        name=_local(element.tag)
+        try :
+            value=float((element.text or '').strip())
+        except ValueError :
+            continue
+        for key in ('westboundingcoordinate','southboundingcoordinate','eastboundingcoordinate','northboundingcoordinate',
+                    'pointlongitude','pointlatitude','longitude','latitude') :
+            if name == key :
+                values.setdefault(key,[]).append(value)
+    if all(key in values for key in ('westboundingcoordinate','southboundingcoordinate','eastboundingcoordinate','northboundingcoordinate')) :
+        return (min(values['westboundingcoordinate']),min(values['southboundingcoordinate']),
+                max(values['eastboundingcoordinate']),max(values['northboundingcoordinate']))
+    for lonKey,latKey in (('pointlongitude','pointlatitude'),('longitude','latitude')) :
+        if lonKey in values and latKey in values :
+            return min(values[lonKey]),min(values[latKey]),max(values[lonKey]),max(values[latKey])
+    return None
+
+
+def overlaps(a,b) :
+    """ whether the (west, south, east, north) boxes -- a -- and -- b -- meet."""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class regionCatalog :
+    """ Where the region directories of a product (Wcoast-69.10N ...) are, kept as JSON at -- path --, for
+ picking regions by --bbox/--point instead of crawling all of them. A region is placed by its name until
+ the metadata of one of its granules has been seen, then by the union of its granules' bounding boxes.
+ A name gives a latitude and rarely a longitude; a missing one is taken as the whole range and the
+ latitude as a band of halfHeight degrees either side. Regions with no location at all match every query,
+ so nothing is skipped by mistake. Queries go through boxes sorted by their southern edge:
+        catalog.addNames(dirs)
+        dirs=catalog.select(dirs,(west,south,east,north))"""
+
+    halfHeight=0.25
+
+    def __init__(self,path) :
+        self.path=path
+        self.lock=threading.Lock()
+        self.index=None
+        try :
+            with open(self.path) as f :
+                self.regions=json.load(f)
+        except (IOError,ValueError) :
+            self.regions={}
+
+    def addNames(self,dirs) :
+        """ put the region directories -- dirs -- in the catalog, located by their names."""
+        with self.lock :
+            for name in dirs :
+                if name not in self.regions :
+                    self.regions[name]={'name':nameLocation(name),'granules':{}}
+                    self.index=None
+
+    def addGranule(self,region,granule,xmlPath) :
+        """ locate -- region -- by the metadata file -- xmlPath -- of its granule -- granule --."""
+        bounds=metadataBounds(xmlPath)
+        if bounds is None :
+            return
+        with self.lock :
+            self.regions.setdefault(region,{'name':nameLocation(region),'granules':{}})['granules'][granule]=list(bounds)
+            self.index=None
+
+    def hasGranule(self,region,granule) :
+        with self.lock :
+            return granule in self.regions.get(region,{}).get('granules',{})
+
+    def box(self,region) :
+        """ (west, south, east, north) of -- region --, None when nothing places it."""
+        entry=self.regions.get(region)
+        if entry is None :
+            return None
+        granules=list(entry['granules'].values())
+        if granules :
+            return (min(g[0] for g in granules),min(g[1] for g in granules),
+                    max(g[2] for g in granules),max(g[3] for g in granules))
+        lat,lon=entry['name']
+        if lat is None :
+            return None
+        return (-180. if lon is None else lon,lat-self.halfHeight,180. if lon is None else lon,lat+self.halfHeight)
+
+    def _buildIndex(self) :
+        boxes=[]
+        unplaced=set()
+        for region in self.regions :
+            box=self.box(region)
+            if box is None :
+                unplaced.add(region)
+            else :
+                boxes.append((box[1],box,region))
+        boxes.sort()
+        self.index=([south for south,box,region in boxes],[(box,region) for south,box,region in boxes],unplaced)
+
+    def query(self,bbox) :
+        """ names of the regions meeting the (west, south, east, north) box -- bbox --."""
+        with self.lock :
+            if self.index is None :
+                self._buildIndex()
+            souths,boxes,unplaced=self.index
+        # only boxes starting south of the query's northern edge can meet it
+        found=set(unplaced)
+        for box,region in boxes[:bisect.bisect_right(souths,bbox[3])] :
+            if overlaps(box,bbox) :
+                found.add(region)
+        return found
+
+    def select(self,dirs,bbox) :
+        """ the region directories in -- dirs -- meeting -- bbox --."""
+        self.addNames(dirs)
+        found=self.query(bbox)
+        return [name for name in dirs if name in found]
+
+    def save(self) :
+        with self.lock :
+            directory=os.path.dirname(self.path)
+            if directory and not os.path.exists(directory) :
+                os.makedirs(directory)
+            with open(self.path+'.tmp','w') as f :
+                json.dump(self.regions,f,indent=1,sort_keys=True)
+            os.replace(self.path+'.tmp',self.path)
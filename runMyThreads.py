@@ -1,15 +1,20 @@
-# Python 2 and 3:
-from __future__ import print_function   
+# Python 2 and 3 (Python 2 needs the futures backport):
+from __future__ import print_function
 import os
 import time
 import sys
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 #import utilities as u
 
 
-def runMyThreads(threads,maxThreads,message,delay=0.2,prompt=False) :
-    """ Loop through a list of  -- threads -- starting each one.   Allow -- maxThreads -- running at once.
- In each loop iteration check status and print number running along with -- message."""
+def runMyThreads(threads,maxThreads,message,delay=0,prompt=False) :
+    """ Run a list of -- threads -- on a pool of at most -- maxThreads -- workers and wait for all of them.
+ Each item is either a threading.Thread that has not been started (its target is run on a pool worker)
+ or a plain callable. The number running is printed along with -- message -- as each one finishes.
+ -- delay -- optionally staggers the submissions by that many seconds.
+ Returns one future per item; a future's exception() is whatever its item raised (SystemExit included)."""
     #
     # Optional prompt
     #
@@ -21,15 +26,9 @@ def runMyThreads(threads,maxThreads,message,delay=0.2,prompt=False) :
             if ans.lower() == 'n'  :
                 print("User prompted abort")
                 sys.exit()
-    
-    notDone=True
-    nRun=count=0
-    running=[]
-    # make sure always calling from home directory 
+
+    # make sure always calling from home directory
     home=os.getcwd()
-    # delay 
-    if delay < 0.2 :
-        delay=0.2
     # format codes
     bs='\033[1m'      # 1 indicates bold
     norm='\033[0m'    # 0 indicates normal
@@ -37,51 +36,50 @@ def runMyThreads(threads,maxThreads,message,delay=0.2,prompt=False) :
     bls='\033[1;46m'  # 46 is cyan, 40 is black
     # time for counter
     start=datetime.now()
-    # loop counter
-    n=0    
+    status={'nRun':0,'count':0,'nDone':0,'nFailed':0}
+    lock=threading.Lock()
     print(grs,message,norm,end='\n')
-    while notDone :
-        #
-        # Start a thread is < maxThreads
-        #
-        if n % 1 == 0 :
-            timeElapsed=datetime.now() - start
-            print('Threads (max =',maxThreads,')',norm,': nRunning ',bs,'{:5}'.format(nRun),norm,'nStarted ',bs,'{:5}'.format(count)  , \
-                  norm,'nToGo ',bs,'{:5}'.format(len(threads)-count),'  ',bls,timeElapsed,norm ,'     '.ljust(maxThreads+8),end='\r')
-            print('Threads (max =',maxThreads,')',norm,': nRunning ',bs,'{:5}'.format(nRun),norm,'nStarted ',bs,'{:5}'.format(count)  ,\
-                  norm,'nToGo ',bs,'{:5}'.format(len(threads)-count),'  ',bls,timeElapsed,norm ,'     ',end='')            
-            sys.stdout.flush()
-            
-        while count < len(threads) and nRun < maxThreads:
-            # run thread and always make sure to return to current directory
+
+    def report() :
+        timeElapsed=datetime.now() - start
+        print('Threads (max =',maxThreads,')',norm,': nRunning ',bs,'{:5}'.format(status['nRun']),norm,'nStarted ',bs,'{:5}'.format(status['count'])  , \
+              norm,'nToGo ',bs,'{:5}'.format(len(threads)-status['count']),'  ',bls,timeElapsed,norm ,'     ',end='\r')
+        sys.stdout.flush()
+
+    def runOne(item) :
+        # run thread and always make sure to return to current directory
+        with lock :
             os.chdir(home)
-            print('.',end='')
-            sys.stdout.flush()
-            threads[count].start()
-            time.sleep(delay)
-            running.append(threads[count])
-            nRun+=1
-            count +=1
-            #
-            # check status of threads
-            #
-        toRemove=[]
-        #
-        # loop through running thread to find threads that are done
-        for t in running :
-            if not t.isAlive() :
-                toRemove.append(t)
-        #
-        # update list of running
-        for t in toRemove :
-                nRun-=1
-                running.remove(t)
-        time.sleep(1)        
-        #
-        print('',end='\r')
-        n+=1
-        if nRun == 0 and count >= len(threads) :
-            notDone=False
+            status['nRun']+=1
+            status['count']+=1
+            report()
+        if isinstance(item,threading.Thread) :
+            item.run()
+        else :
+            item()
+
+    def finished(future) :
+        # completion callback, runs as soon as an item returns or raises
+        with lock :
+            status['nRun']-=1
+            status['nDone']+=1
+            if future.exception() is not None :
+                status['nFailed']+=1
+            report()
+
+    futures=[]
+    pool=ThreadPoolExecutor(max_workers=maxThreads)
+    try :
+        for item in threads :
+            f=pool.submit(runOne,item)
+            f.add_done_callback(finished)
+            futures.append(f)
+            if delay > 0 :
+                time.sleep(delay)
+    finally :
+        pool.shutdown(wait=True)
     print('\n')
-    #u.myalert('Threads Done') 
-    return
+    if status['nFailed'] :
+        print(status['nFailed'],'of',len(threads),'failed')
+    #u.myalert('Threads Done')
+    return futures
@@ -0,0 +1,45 @@
+# Python 2 and 3:
+from __future__ import print_function
+import os
+import hashlib
+
+
+def parseShard(spec) :
+    """ 'i/N' from --shard as (i, N), 1 <= i <= N."""
+    try :
+        i,n=[int(part) for part in spec.split('/')]
+    except ValueError :
+        raise ValueError('a shard is given as i/N, e.g. 2/4, not {0}'.format(spec))
+    if not 1 <= i <= n :
+        raise ValueError('shard {0} is not one of 1/{1} .. {1}/{1}'.format(spec,n))
+    return i,n
+
+
+def granuleKey(relpath) :
+    """ -- relpath -- without its .xml and its extension, the same for a data file and its granule metadata:
+ dir/x.tif, dir/x.tif.xml and dir/x.xml all give dir/x."""
+    if relpath.lower().endswith('.xml') :
+        relpath=relpath[:-4]
+    return os.path.splitext(relpath)[0]
+
+
+def shardOf(relpath,nShards) :
+    """ which of -- nShards -- shards (1..nShards) the file at -- relpath -- below the product belongs to.
+ Rendezvous hashing: every shard scores the granule (see granuleKey) and the highest score wins, so all
+ machines agree without talking to each other, a file and its .xml sidecar go to the same shard, and going
+ from N to N+1 shards only moves the granules the new shard wins."""
+    key=granuleKey(relpath)
+    def score(shard) :
+        return hashlib.sha1('{0}:{1}'.format(shard,key).encode('utf-8')).digest()
+    return max(range(1,nShards+1),key=score)
+
+
+def inShard(relpath,shard) :
+    """ whether -- relpath -- belongs to -- shard --, an (i, N) pair; everything does when shard is None."""
+    return shard is None or shardOf(relpath,shard[1]) == shard[0]
+
+
+def shardSuffix(shard) :
+    """ what the state files of -- shard -- are told apart by, so shards sharing a file system do not write
+ to the same manifest and database: '.shard2of4', '' without sharding."""
+    return '.shard{0}of{1}'.format(*shard) if shard else ''